@@ -0,0 +1,43 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from foodgram.models import (
+    Ingredient, Recipe, ShopingCart, ShoppingListItem, Tag,
+)
+from users.models import CustomUser
+
+from .v1.cache import INGREDIENTS, RECIPES, TAGS, bump_version
+
+AUTHOR_FIELDS = {"username", "email", "first_name", "last_name"}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def reference_changed(sender, **kwargs):
+    bump_version(RECIPES)
+    bump_version(INGREDIENTS if sender is Ingredient else TAGS)
+
+
+@receiver(post_save, sender=CustomUser)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        return
+    bump_version(RECIPES)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Take the recipe out of the shopping list totals of its carts."""
+    amounts = ShoppingListItem.objects.recipe_amounts(instance.id)
+    ShoppingListItem.objects.apply(
+        list(
+            ShopingCart.objects.filter(recipe=instance).values_list(
+                "user_id", flat=True
+            )
+        ),
+        {ingredient: -amount for ingredient, amount in amounts.items()},
+    )
@@ -0,0 +1,73 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from foodgram_backend.metrics import registry
+
+RECIPES = "recipes"
+TAGS = "tags"
+INGREDIENTS = "ingredients"
+
+
+def version_timeout():
+    """How long a version stamp is kept.
+
+    A process-local cache does not see the bumps made by the other
+    workers, so its stamps expire to bound how long they stay stale.
+    """
+    if isinstance(caches["versions"], LocMemCache):
+        return settings.LOCAL_CACHE_VERSION_TIMEOUT
+    return None
+
+
+def get_version(name):
+    """Return the version stamp of a cached data set.
+
+    The stamp is the time of the last change, so it can also be used as
+    a modification date.
+    """
+    versions = caches["versions"]
+    key = f"version:{name}"
+    version = versions.get(key)
+    if version is None:
+        versions.add(key, time.time(), timeout=version_timeout())
+        version = versions.get(key)
+    return version
+
+
+def bump_version(name):
+    caches["versions"].set(
+        f"version:{name}", time.time(), timeout=version_timeout()
+    )
+
+
+def recipe_cache_key(recipe, version):
+    return f"recipe:{recipe.id}:{recipe.updated.timestamp()}:{version}"
+
+
+def get_rendered_recipes(recipes, render):
+    """Return the shared representation of every recipe.
+
+    ``render`` builds the representations of the recipes missing from the
+    cache in one go; all cache lookups are done with get_many/set_many.
+    """
+    version = get_version(RECIPES)
+    keys = [recipe_cache_key(recipe, version) for recipe in recipes]
+    rendered = cache.get_many(keys)
+    missing = {}
+    for key, recipe in zip(keys, recipes):
+        if key not in rendered:
+            missing[key] = recipe
+    registry.inc("cache_hits_total", len(keys) - len(missing), cache=RECIPES)
+    registry.inc("cache_misses_total", len(missing), cache=RECIPES)
+    if missing:
+        fresh = dict(zip(missing, render(list(missing.values()))))
+        cache.set_many(fresh, settings.RECIPE_CACHE_TIMEOUT)
+        rendered.update(fresh)
+    return [rendered[key] for key in keys]
+
+
+def invalidate_recipe(recipe):
+    cache.delete(recipe_cache_key(recipe, get_version(RECIPES)))
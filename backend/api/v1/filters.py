@@ -1,6 +1,8 @@
 from django_filters import rest_framework as filters
 
-from foodgram.models import Ingredient, Recipe, Tag
+from django.db.models import Exists, OuterRef
+
+from foodgram.models import Ingredient, Recipe, RecipeTag, Tag
 
 
 class IngredientsFilter(filters.FilterSet):
@@ -14,10 +16,10 @@ class IngredientsFilter(filters.FilterSet):
 class RecipeFilter(filters.FilterSet):
     author = filters.CharFilter()
     tags = filters.ModelMultipleChoiceFilter(
-        field_name="tags__slug",
         queryset=Tag.objects.all(),
         label="Tags",
         to_field_name="slug",
+        method="filter_tags",
     )
     is_favorited = filters.BooleanFilter(method="get_favorite")
     is_in_shopping_cart = filters.BooleanFilter(method="get_is_in_shopp_cart")
@@ -26,12 +28,26 @@ class RecipeFilter(filters.FilterSet):
         model = Recipe
         fields = ("tags", "author", "is_favorited", "is_in_shopping_cart")
 
-    def get_favorite(self, queryset, value, name):
+    def filter_tags(self, queryset, name, value):
+        """Recipes with any of the tags, as a semi-join without duplicates."""
+        if not value:
+            return queryset
+        return queryset.filter(
+            Exists(
+                RecipeTag.objects.filter(recipe=OuterRef("pk"), tag__in=value)
+            )
+        )
+
+    def get_favorite(self, queryset, name, value):
         if value:
-            return queryset.filter(favorite_recipe__user=self.request.user)
+            if self.request.user.is_anonymous:
+                return queryset.none()
+            return queryset.filter(is_favorited=True)
         return queryset
 
-    def get_is_in_shopp_cart(self, queryset, value, name):
+    def get_is_in_shopp_cart(self, queryset, name, value):
         if value:
-            return queryset.filter(shopping_recipe__user=self.request.user)
+            if self.request.user.is_anonymous:
+                return queryset.none()
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from foodgram_backend.metrics import registry
+
+from .cache import get_version
+
+
+class ReferenceCacheMixin:
+    """Conditional GET and response caching for reference data viewsets.
+
+    ETag and Last-Modified come from the version stamp of ``version_name``,
+    so a matching If-None-Match is answered with 304 without touching the
+    database. Rendered JSON bodies are cached per version and URL.
+    Reference data is public, so requests are not authenticated.
+    """
+
+    version_name = None
+    authentication_classes = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            self.get_list_response, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_list_response(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        version = get_version(self.version_name)
+        etag = quote_etag(f"{self.version_name}-{version}")
+        last_modified = int(version)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = self.get_rendered_response(
+                f"response:{etag}:{request.get_full_path()}",
+                handler,
+                request,
+                *args,
+                **kwargs,
+            )
+            if response.status_code != 200:
+                return response
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(
+            response, public=True, max_age=settings.REFERENCE_CACHE_MAX_AGE
+        )
+        return response
+
+    def get_rendered_response(self, key, handler, request, *args, **kwargs):
+        if request.accepted_renderer.format != "json":
+            return handler(request, *args, **kwargs)
+        cached = cache.get(key)
+        registry.inc(
+            "cache_misses_total" if cached is None else "cache_hits_total",
+            cache=self.version_name,
+        )
+        if cached is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+            cached = (response.content, response["Content-Type"])
+            cache.set(key, cached, settings.REFERENCE_CACHE_TIMEOUT)
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
@@ -0,0 +1,170 @@
+import base64
+import heapq
+from collections import OrderedDict
+from datetime import datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination, CursorPagination, PageNumberPagination,
+)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from django.db.models import Q
+from django.urls import reverse
+
+
+class RecipeCursorPagination(CursorPagination):
+    ordering = ("-pub_date", "-id")
+
+
+class RecipePagination(PageNumberPagination):
+    """Page number pagination with an opt-in keyset (cursor) mode.
+
+    Cursor mode is enabled with ``?pagination=cursor`` and kept for the
+    following pages by the ``cursor`` parameter of the next/previous links.
+    """
+
+    mode_query_param = "pagination"
+    cursor_class = RecipeCursorPagination
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.cursor_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view=view
+            )
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class SubscriptionsPagination(PageNumberPagination):
+    """Page number pagination with links to the subscriptions list.
+
+    The subscribe endpoint answers with the first page of the list too,
+    so the links are not built from the current request path.
+    """
+
+    def get_list_url(self):
+        query = self.request.query_params.copy()
+        query.pop("full", None)
+        url = self.request.build_absolute_uri(reverse("subscriptions"))
+        return f"{url}?{query.urlencode()}" if query else url
+
+    def get_next_link(self):
+        if not self.page.has_next():
+            return None
+        return replace_query_param(
+            self.get_list_url(),
+            self.page_query_param,
+            self.page.next_page_number(),
+        )
+
+    def get_previous_link(self):
+        if not self.page.has_previous():
+            return None
+        page_number = self.page.previous_page_number()
+        if page_number == 1:
+            return remove_query_param(
+                self.get_list_url(), self.page_query_param
+            )
+        return replace_query_param(
+            self.get_list_url(), self.page_query_param, page_number
+        )
+
+
+class FeedPagination(BasePagination):
+    """Keyset pagination over (pub_date, recipe id), newest first.
+
+    Pages are merged from several sources of (recipe id, pub_date) rows,
+    each read with one index range scan from the cursor position.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            pub_date, pk = (
+                base64.urlsafe_b64decode(encoded.encode()).decode().split("|")
+            )
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound("Неверный курсор")
+
+    def encode_cursor(self, pub_date, pk):
+        return base64.urlsafe_b64encode(
+            f"{pub_date.isoformat()}|{pk}".encode()
+        ).decode()
+
+    def paginate_sources(self, sources, request):
+        """Return the recipe ids of the page.
+
+        ``sources`` are (queryset, recipe id field) pairs; the querysets
+        have a ``pub_date`` field and may overlap.
+        """
+        self.request = request
+        size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        rows = []
+        for queryset, field in sources:
+            if position is not None:
+                pub_date, pk = position
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date)
+                    | Q(pub_date=pub_date, **{f"{field}__lt": pk})
+                )
+            rows.append(
+                queryset.order_by("-pub_date", f"-{field}").values_list(
+                    "pub_date", field
+                )[: size + 1]
+            )
+        page = []
+        for row in heapq.merge(*rows, reverse=True):
+            if not page or page[-1] != row:
+                page.append(row)
+        self.next_position = page[size - 1] if len(page) > size else None
+        return [pk for _, pk in page[:size]]
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(*self.next_position),
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", None),
+                    ("results", data),
+                ]
+            )
+        )
@@ -0,0 +1,75 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class Echo:
+    """File-like object returning what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Base of the shopping list formats.
+
+    The list itself is streamed with ``stream``; ``render`` is only used
+    for error responses.
+    """
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, dict):
+            data = data.get("detail", data)
+        return str(data).encode(self.charset)
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = "text/plain"
+    format = "txt"
+
+    def stream(self, ingredients):
+        for ingredient in ingredients:
+            yield "{name}({measurement_unit}) - {total}\n".format(
+                **ingredient
+            )
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(("name", "measurement_unit", "amount"))
+        for ingredient in ingredients:
+            yield writer.writerow(
+                (
+                    ingredient["name"],
+                    ingredient["measurement_unit"],
+                    ingredient["total"],
+                )
+            )
+
+
+class ShoppingListJSONRenderer(JSONRenderer):
+    charset = "utf-8"
+
+    def stream(self, ingredients):
+        separator = ""
+        yield "["
+        for ingredient in ingredients:
+            yield separator + json.dumps(
+                {
+                    "name": ingredient["name"],
+                    "measurement_unit": ingredient["measurement_unit"],
+                    "amount": ingredient["total"],
+                },
+                ensure_ascii=False,
+            )
+            separator = ","
+        yield "]"
@@ -0,0 +1,104 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from django.conf import settings
+
+from foodgram.models import Ingredient
+
+from .cache import INGREDIENTS, get_version
+
+Snapshot = namedtuple(
+    "Snapshot", ("version", "loaded_at", "keys", "text", "offsets", "rows")
+)
+
+
+class IngredientIndex:
+    """In-memory autocomplete index over the ingredient reference table.
+
+    Names are kept casefolded and sorted, so prefix matches are found with a
+    binary search. The same names joined into one string allow substring
+    matches to be found with str.find instead of a Python level scan.
+
+    The index is loaded on first use and reloaded when the ``ingredients``
+    version changes or the snapshot is older than INGREDIENT_INDEX_TTL.
+    """
+
+    separator = "\n"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def load(self, version):
+        rows = sorted(
+            Ingredient.objects.values_list("name", "id", "measurement_unit"),
+            key=lambda row: (row[0].casefold(), row[1]),
+        )
+        keys = [name.casefold() for name, _, _ in rows]
+        offsets = []
+        position = 0
+        for key in keys:
+            offsets.append(position)
+            position += len(key) + len(self.separator)
+        return Snapshot(
+            version,
+            time.monotonic(),
+            keys,
+            self.separator.join(keys),
+            offsets,
+            rows,
+        )
+
+    def get_snapshot(self):
+        version = get_version(INGREDIENTS)
+        snapshot = self._snapshot
+        if (
+            snapshot is None
+            or snapshot.version != version
+            or time.monotonic() - snapshot.loaded_at
+            > settings.INGREDIENT_INDEX_TTL
+        ):
+            with self._lock:
+                if self._snapshot is snapshot:
+                    self._snapshot = self.load(version)
+                snapshot = self._snapshot
+        return snapshot
+
+    def search(self, query, limit=None):
+        """Ingredients containing ``query``, prefix matches first."""
+        query = query.strip().casefold()
+        snapshot = self.get_snapshot()
+        if not query or self.separator in query:
+            return []
+        found = []
+        start = bisect_left(snapshot.keys, query)
+        for position in range(start, len(snapshot.keys)):
+            if not snapshot.keys[position].startswith(query):
+                break
+            found.append(position)
+            if len(found) == limit:
+                return self.represent(snapshot, found)
+        position = snapshot.text.find(query)
+        while position != -1:
+            index = bisect_right(snapshot.offsets, position) - 1
+            if snapshot.offsets[index] != position:
+                found.append(index)
+                if len(found) == limit:
+                    break
+            if index + 1 == len(snapshot.offsets):
+                break
+            position = snapshot.text.find(query, snapshot.offsets[index + 1])
+        return self.represent(snapshot, found)
+
+    def represent(self, snapshot, positions):
+        return [
+            {"name": name, "id": pk, "measurement_unit": measurement_unit}
+            for name, pk, measurement_unit in (
+                snapshot.rows[position] for position in positions
+            )
+        ]
+
+
+ingredient_index = IngredientIndex()
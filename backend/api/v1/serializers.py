@@ -1,16 +1,43 @@
 import base64
+import binascii
 
 import webcolors
 from djoser.serializers import UserCreateSerializer, UserSerializer
+from PIL import Image
 from rest_framework import serializers
 
-from django.core.files.base import ContentFile
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 
 from foodgram.models import (
     CustomUser, Favorite, Follow, Ingredient, Recipe, RecipeIngredient,
-    RecipeTag, ShopingCart, Tag,
+    RecipeTag, ShopingCart, ShoppingListItem, Tag, change_counter,
 )
+from foodgram.tasks import fan_out_recipe, generate_recipe_thumbnails
+
+from .cache import get_rendered_recipes
+
+
+def get_followed_authors(request):
+    """Ids of authors the request user follows, loaded once per request."""
+    followed = getattr(request, "followed_authors", None)
+    if followed is None:
+        followed = set(
+            Follow.objects.filter(user=request.user).values_list(
+                "author_id", flat=True
+            )
+        )
+        request.followed_authors = followed
+    return followed
+
+
+def get_recipes_limit(request):
+    try:
+        return int(request.query_params.get("recipes_limit"))
+    except (TypeError, ValueError):
+        return None
 
 
 class Hex2NameColor(serializers.Field):
@@ -66,14 +93,102 @@ class TagRecipeSerializer(serializers.ModelSerializer):
 
 
 class Base64ImageField(serializers.ImageField):
+    """Image given as a base64 data URI.
+
+    The payload is decoded chunk by chunk into a temporary file. Its size
+    is checked before decoding and its dimensions as soon as the image
+    header is decoded, against RECIPE_IMAGE_MAX_SIZE/MAX_PIXELS.
+    """
+
+    chunk_size = 64 * 1024
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith("data:image"):
-            format, imgstr = data.split(";base64,")
-            ext = format.split("/")[-1]
+            data = self.decode(data)
+        return super().to_internal_value(data)
 
-            data = ContentFile(base64.b64decode(imgstr), name="temp." + ext)
+    def decode(self, data):
+        header, _, encoded = data.partition(";base64,")
+        ext = header.split("/")[-1]
+        if len(encoded) // 4 * 3 > settings.RECIPE_IMAGE_MAX_SIZE:
+            raise serializers.ValidationError("Изображение слишком большое")
+        upload = TemporaryUploadedFile(
+            "temp." + ext, "image/" + ext, 0, None
+        )
+        checked = False
+        try:
+            for start in range(0, len(encoded), self.chunk_size):
+                upload.write(
+                    base64.b64decode(encoded[start:start + self.chunk_size])
+                )
+                if not checked:
+                    checked = self.check_pixels(upload)
+            if not checked:
+                self.check_pixels(upload)
+        except (binascii.Error, serializers.ValidationError) as error:
+            upload.close()
+            if isinstance(error, serializers.ValidationError):
+                raise
+            raise serializers.ValidationError("Некорректное изображение")
+        upload.size = upload.tell()
+        upload.seek(0)
+        return upload
+
+    def check_pixels(self, upload):
+        """Check the image dimensions if its header is already written.
+
+        Only the header is read; the pixel data is not decoded.
+        """
+        upload.flush()
+        try:
+            with Image.open(upload.temporary_file_path()) as image:
+                pixels = image.width * image.height
+        except Image.DecompressionBombError:
+            # Pillow refuses images far above its own pixel limit.
+            pixels = None
+        except (OSError, SyntaxError):
+            return False
+        if pixels is None or pixels > settings.RECIPE_IMAGE_MAX_PIXELS:
+            raise serializers.ValidationError(
+                "Слишком большое разрешение изображения"
+            )
+        return True
 
-        return super().to_internal_value(data)
+
+class ThumbnailsField(serializers.ReadOnlyField):
+    """Urls of the downscaled copies of the recipe image.
+
+    Variants that have not been generated fall back to the original image.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "*"
+        super().__init__(**kwargs)
+
+    def get_urls(self, recipe):
+        if not recipe.image:
+            return {}
+        storage = recipe.image.storage
+        return {
+            name: storage.url(recipe.thumbnails[name])
+            if name in recipe.thumbnails
+            else recipe.image.url
+            for size in settings.RECIPE_THUMBNAIL_SIZES
+            for name in (size, size + "_webp")
+        }
+
+    def to_representation(self, recipe):
+        return absolute_urls(
+            self.context.get("request"), self.get_urls(recipe)
+        )
+
+
+def absolute_urls(request, urls):
+    if request is None:
+        return urls
+    return {
+        name: request.build_absolute_uri(url) for name, url in urls.items()
+    }
 
 
 class RecipeSerializerPost(serializers.ModelSerializer):
@@ -98,21 +213,63 @@ class RecipeSerializerPost(serializers.ModelSerializer):
         )
         model = Recipe
 
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get("image")
+            if image is not None:
+                image.close()
+
+    def validate_ingredients(self, value):
+        """Map ingredient ids to amounts, checking them in one query."""
+        try:
+            amounts = {
+                int(ingredient["id"]): int(ingredient["amount"])
+                for ingredient in value
+            }
+        except (KeyError, TypeError, ValueError):
+            raise serializers.ValidationError(
+                "Укажите id и количество каждого ингредиента"
+            )
+        if len(amounts) != len(value):
+            raise serializers.ValidationError(
+                "Ингредиенты не должны повторяться"
+            )
+        if any(amount < 1 for amount in amounts.values()):
+            raise serializers.ValidationError("Слишком малое количество")
+        if len(Ingredient.objects.in_bulk(amounts)) != len(amounts):
+            raise serializers.ValidationError("Ингредиент не найден")
+        return amounts
+
+    def validate_tags(self, value):
+        try:
+            tags = list(dict.fromkeys(int(tag) for tag in value))
+        except (TypeError, ValueError):
+            raise serializers.ValidationError("Укажите id тегов")
+        if len(Tag.objects.in_bulk(tags)) != len(tags):
+            raise serializers.ValidationError("Тег не найден")
+        return tags
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop("ingredients")
         tags = validated_data.pop("tags")
         recipe = Recipe.objects.create(**validated_data)
-        for ingredient in ingredients:
-            amount = ingredient.pop("amount")
-            current_ingredient = get_object_or_404(
-                Ingredient, id=ingredient["id"]
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipes=recipe, ingredients_id=ingredient, amount=amount
             )
-            RecipeIngredient.objects.create(
-                ingredients=current_ingredient, recipes=recipe, amount=amount
-            )
-        for tag in tags:
-            current_tag = get_object_or_404(Tag, id=tag)
-            RecipeTag.objects.create(recipe=recipe, tag=current_tag)
+            for ingredient, amount in ingredients.items()
+        )
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag_id=tag) for tag in tags
+        )
+        change_counter(
+            CustomUser.objects.filter(pk=recipe.author_id), "recipes_count", 1
+        )
+        generate_recipe_thumbnails.enqueue(recipe_id=recipe.id)
+        fan_out_recipe.enqueue(recipe_id=recipe.id)
         return recipe
 
     def to_representation(self, recipe):
@@ -120,23 +277,73 @@ class RecipeSerializerPost(serializers.ModelSerializer):
         context = {"request": request}
         return RecipeSerializer(recipe, context=context).data
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop("tags")
-        ingredients = validated_data.pop("ingredients")
+        tags = validated_data.pop("tags", None)
+        ingredients = validated_data.pop("ingredients", None)
         instance = super().update(instance, validated_data)
-        instance.ingredients.clear()
-        instance.tags.clear()
-        instance.tags.set(tags)
-        for ingredient in ingredients:
-            amount = ingredient.pop("amount")
-            current_ingredient = get_object_or_404(
-                Ingredient, id=ingredient["id"]
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
+        if tags is not None:
+            self.update_tags(instance, tags)
+        if "image" in validated_data:
+            generate_recipe_thumbnails.enqueue(recipe_id=instance.id)
+        return instance
+
+    def update_ingredients(self, instance, ingredients):
+        """Write only the changed rows and the cart totals they affect."""
+        current = {
+            recipe_ingredient.ingredients_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipes=instance
             )
-            RecipeIngredient.objects.create(
-                ingredients=current_ingredient, recipes=instance, amount=amount
+        }
+        deltas = {
+            ingredient: amount - getattr(current.get(ingredient), "amount", 0)
+            for ingredient, amount in ingredients.items()
+        }
+        removed = current.keys() - ingredients.keys()
+        for ingredient in removed:
+            deltas[ingredient] = -current[ingredient].amount
+        changed = []
+        for ingredient, recipe_ingredient in current.items():
+            if deltas.get(ingredient) and ingredient not in removed:
+                recipe_ingredient.amount = ingredients[ingredient]
+                changed.append(recipe_ingredient)
+        RecipeIngredient.objects.filter(
+            recipes=instance, ingredients_id__in=removed
+        ).delete()
+        RecipeIngredient.objects.bulk_update(changed, ["amount"])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipes=instance, ingredients_id=ingredient, amount=amount
             )
-        instance.save()
-        return instance
+            for ingredient, amount in ingredients.items()
+            if ingredient not in current
+        )
+        ShoppingListItem.objects.apply(
+            list(
+                ShopingCart.objects.filter(recipe=instance).values_list(
+                    "user_id", flat=True
+                )
+            ),
+            deltas,
+        )
+
+    def update_tags(self, instance, tags):
+        current_tags = set(
+            RecipeTag.objects.filter(recipe=instance).values_list(
+                "tag_id", flat=True
+            )
+        )
+        RecipeTag.objects.filter(
+            recipe=instance, tag_id__in=current_tags - set(tags)
+        ).delete()
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=instance, tag_id=tag)
+            for tag in tags
+            if tag not in current_tags
+        )
 
 
 class CustomUserSerializer(UserSerializer):
@@ -159,7 +366,7 @@ class CustomUserSerializer(UserSerializer):
             user = request.user
             if user.is_anonymous:
                 return False
-            return Follow.objects.filter(author=obj, user=user).exists()
+            return obj.id in get_followed_authors(request)
         return False
 
 
@@ -177,12 +384,23 @@ class CustomUserPostSerializer(UserCreateSerializer):
         )
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = list(data.all() if hasattr(data, "all") else data)
+        rendered = get_rendered_recipes(recipes, self.child.render_shared)
+        return [
+            self.child.personalize(representation, recipe)
+            for representation, recipe in zip(rendered, recipes)
+        ]
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     ingredients = RecipesIngredientsSerializer(
         many=True, source="recipes_ingredients"
     )
     tags = TagsSerializer(many=True)
     author = CustomUserSerializer(read_only=True)
+    thumbnails = ThumbnailsField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -192,6 +410,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             "name",
             "author",
             "image",
+            "thumbnails",
             "ingredients",
             "tags",
             "text",
@@ -200,31 +419,78 @@ class RecipeSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
         )
         model = Recipe
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, recipe):
+        rendered = get_rendered_recipes([recipe], self.render_shared)[0]
+        return self.personalize(rendered, recipe)
+
+    def render_shared(self, recipes):
+        """Representations of the recipes that are the same for every user.
+
+        Ingredients and tags are only fetched for the recipes rendered here,
+        i.e. the ones missing from the cache.
+        """
+        prefetch_related_objects(
+            recipes,
+            Prefetch(
+                "recipes_ingredients",
+                queryset=RecipeIngredient.objects.select_related(
+                    "ingredients"
+                ),
+            ),
+            "tags",
+        )
+        rendered = []
+        for recipe in recipes:
+            data = super().to_representation(recipe)
+            data["image"] = recipe.image.url if recipe.image else None
+            data["thumbnails"] = self.fields["thumbnails"].get_urls(recipe)
+            data["author"]["is_subscribed"] = False
+            data["is_favorited"] = False
+            data["is_in_shopping_cart"] = False
+            rendered.append(data)
+        return rendered
+
+    def personalize(self, rendered, recipe):
+        """Apply the fields depending on the request user."""
+        request = self.context.get("request")
+        data = rendered.copy()
+        if data["image"] and request is not None:
+            data["image"] = request.build_absolute_uri(data["image"])
+        data["thumbnails"] = absolute_urls(request, data["thumbnails"])
+        data["author"] = data["author"].copy()
+        data["author"]["is_subscribed"] = self.fields[
+            "author"
+        ].get_is_subscribed(recipe.author)
+        data["is_favorited"] = self.get_is_favorited(recipe)
+        data["is_in_shopping_cart"] = self.get_is_in_shopping_cart(recipe)
+        return data
 
     def get_is_favorited(self, obj):
         request = self.context.get("request")
         if request.user.is_anonymous:
             return False
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         return Favorite.objects.filter(recipe=obj, user=request.user).exists()
 
     def get_is_in_shopping_cart(self, obj):
         request = self.context.get("request")
         if request.user.is_anonymous:
             return False
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         return ShopingCart.objects.filter(
             recipe=obj, user=request.user
         ).exists()
 
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
-    name = serializers.CharField(source="recipe.name", read_only=True)
-    cooking_time = serializers.IntegerField(
-        source="recipe.cooking_time", read_only=True
-    )
-    image = serializers.CharField(source="recipe.image", read_only=True)
+    image = serializers.CharField(read_only=True)
 
     class Meta:
-        model = Favorite
+        model = Recipe
         fields = (
             "image",
             "cooking_time",
@@ -234,23 +500,11 @@ class FavoriteRecipeSerializer(serializers.ModelSerializer):
 
 
 class FollowRecipeSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
-
-
-class FollowSerializerPost(serializers.ModelSerializer):
-    user = CustomUserSerializer(read_only=True)
-    author = CustomUserSerializer(read_only=True)
+    thumbnails = ThumbnailsField()
 
     class Meta:
-        fields = ("user", "author")
-        model = Follow
-
-    def to_representation(self, follow):
-        request = self.context.get("request")
-        context = {"request": request}
-        return FollowSerializer(follow, context=context).data
+        model = Recipe
+        fields = ("id", "name", "image", "thumbnails", "cooking_time")
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -261,7 +515,7 @@ class FollowSerializer(serializers.ModelSerializer):
     last_name = serializers.CharField(source="author.last_name")
     recipes = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField()
+    recipes_count = serializers.IntegerField(source="author.recipes_count")
 
     class Meta:
         model = Follow
@@ -277,21 +531,15 @@ class FollowSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        request = self.context.get("request")
-        user = request.user
-        author = obj.author
-        if Follow.objects.filter(user=user, author=author).exists:
-            return True
-        return False
+        return True
 
     def get_recipes(self, obj):
-        request = self.context.get("request")
-        limit = request.query_params.get("recipes_limit")
-        try:
-            limit = int(limit)
-        except (TypeError, ValueError):
-            limit = None
-        recipes = obj.author.recipe.all()[:limit]
+        recipes = self.context.get("recipes")
+        if recipes is not None:
+            recipes = recipes.get(obj.author_id, [])
+        else:
+            limit = get_recipes_limit(self.context.get("request"))
+            recipes = obj.author.recipe.all()[:limit]
         serializer = FollowRecipeSerializer(
             recipes, many=True, context=self.context
         )
@@ -299,13 +547,9 @@ class FollowSerializer(serializers.ModelSerializer):
 
 
 class ShopingCartSerializer(serializers.ModelSerializer):
-    name = serializers.CharField(source="recipe.name", read_only=True)
-    cooking_time = serializers.CharField(
-        source="recipe.cooking_time", read_only=True
-    )
-    image = serializers.CharField(source="recipe.image", read_only=True)
-    id = serializers.IntegerField(source="recipe.id", read_only=True)
+    cooking_time = serializers.CharField(read_only=True)
+    image = serializers.CharField(read_only=True)
 
     class Meta:
-        model = ShopingCart
+        model = Recipe
         fields = ("name", "cooking_time", "image", "id")
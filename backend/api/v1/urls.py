@@ -14,7 +14,11 @@ router.register(r"tags", TagsViewSet)
 
 urlpatterns = [
     path("users/<int:pk>/subscribe/", SubscribeApiView.as_view()),
-    path("users/subscriptions/", SubscriptionsApiView.as_view()),
+    path(
+        "users/subscriptions/",
+        SubscriptionsApiView.as_view(),
+        name="subscriptions",
+    ),
     path("recipes/download_shopping_cart/", DownloadShopCartView.as_view()),
     path("", include(router.urls)),
     path("", include("djoser.urls")),
@@ -1,36 +1,45 @@
-import io
-
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import (
     AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly,
 )
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from django.db.models import Count, Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
 from foodgram.models import (
-    CustomUser, Favorite, Follow, Ingredient, Recipe, RecipeIngredient,
-    ShopingCart, Tag,
+    CustomUser, Favorite, FeedEntry, Follow, Ingredient, Recipe, ShopingCart,
+    ShoppingListItem, Tag, change_counter,
 )
 
+from .cache import INGREDIENTS, TAGS, invalidate_recipe
 from .filters import IngredientsFilter, RecipeFilter
+from .mixins import ReferenceCacheMixin
+from .pagination import (
+    FeedPagination, RecipePagination, SubscriptionsPagination,
+)
+from .renderers import (
+    ShoppingListCSVRenderer, ShoppingListJSONRenderer,
+    ShoppingListTextRenderer,
+)
+from .search import ingredient_index
 from .serializers import (
-    FavoriteRecipeSerializer, FollowSerializer, FollowSerializerPost,
-    IngredientsSerializer, RecipeSerializer, RecipeSerializerPost,
-    ShopingCartSerializer, TagsSerializer,
+    FavoriteRecipeSerializer, FollowSerializer, IngredientsSerializer,
+    RecipeSerializer, RecipeSerializerPost, ShopingCartSerializer,
+    TagsSerializer, get_recipes_limit,
 )
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
-    pagination_class = PageNumberPagination
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
@@ -38,19 +47,66 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ordering = ["-id"]
 
     def get_queryset(self):
-        query = Recipe.objects.select_related("author").prefetch_related(
-            "ingredients", "tags"
-        )
+        query = Recipe.objects.select_related("author")
+        user = self.request.user
+        if user.is_authenticated:
+            query = query.annotate(
+                is_favorited=Exists(
+                    Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+                ),
+                is_in_shopping_cart=Exists(
+                    ShopingCart.objects.filter(
+                        user=user, recipe=OuterRef("pk")
+                    )
+                ),
+            )
         return query
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def perform_destroy(self, instance):
+        invalidate_recipe(instance)
+        with transaction.atomic():
+            instance.delete()
+            change_counter(
+                CustomUser.objects.filter(pk=instance.author_id),
+                "recipes_count",
+                -1,
+            )
+
     def get_serializer_class(self):
-        if self.action == "list" or self.action == "retrieve":
+        if self.action in ("list", "retrieve", "feed"):
             return RecipeSerializer
         return RecipeSerializerPost
 
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """Recipes of the followed authors, newest first.
+
+        Read from the user's timeline, merged with the recipes of the
+        followed authors too popular to be fanned out.
+        """
+        user = request.user
+        sources = [(FeedEntry.objects.filter(user=user), "recipe_id")]
+        pulled = list(
+            Follow.objects.filter(
+                user=user,
+                author__followers_count__gt=(
+                    settings.FEED_FANOUT_MAX_FOLLOWERS
+                ),
+            ).values_list("author_id", flat=True)
+        )
+        if pulled:
+            sources.append((Recipe.objects.filter(author__in=pulled), "id"))
+        paginator = FeedPagination()
+        ids = paginator.paginate_sources(sources, request)
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         detail=True,
         methods=["post", "delete"],
@@ -59,21 +115,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def favorite(self, request, pk):
         user = request.user
         if request.method == "POST":
-            if not Favorite.objects.filter(user=user, recipe=pk).exists():
-                recipe = get_object_or_404(Recipe, pk=pk)
-                serializer = FavoriteRecipeSerializer(data=request.data)
-                serializer.is_valid(raise_exception=True)
-                serializer.save(user=user, recipe=recipe)
-                return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
+            recipe = get_object_or_404(Recipe, pk=pk)
+            with transaction.atomic():
+                if not Favorite.relations.add(user, recipe.pk):
+                    return Response(
+                        "Рецепт уже в избранном",
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                change_counter(
+                    Recipe.objects.filter(pk=pk), "favorites_count", 1
                 )
             return Response(
-                "Рецепт уже в избранном", status=status.HTTP_400_BAD_REQUEST
-            )
-        if Favorite.objects.filter(user=user, recipe=pk).delete()[0] == 0:
-            return Response(
-                "Рецепта нет в избранном", status=status.HTTP_400_BAD_REQUEST
+                FavoriteRecipeSerializer(recipe).data,
+                status=status.HTTP_201_CREATED,
             )
+        with transaction.atomic():
+            if not Favorite.relations.remove(user, pk):
+                return Response(
+                    "Рецепта нет в избранном",
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            change_counter(Recipe.objects.filter(pk=pk), "favorites_count", -1)
         return Response(
             "Рецепт удален из избранного", status=status.HTTP_204_NO_CONTENT
         )
@@ -90,21 +152,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 "Вы не авторизованы", status=status.HTTP_401_UNAUTHORIZED
             )
         if request.method == "POST":
-            if not ShopingCart.objects.filter(user=user, recipe=pk).exists():
-                recipe = get_object_or_404(Recipe, pk=pk)
-                serializer = ShopingCartSerializer(data=request.data)
-                serializer.is_valid(raise_exception=True)
-                serializer.save(user=user, recipe=recipe)
-                return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
+            recipe = get_object_or_404(Recipe, pk=pk)
+            with transaction.atomic():
+                if not ShopingCart.relations.add(user, recipe.pk):
+                    return Response(
+                        "Рецепт уже в корзине",
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                ShoppingListItem.objects.add_recipe(user, recipe.pk)
+                change_counter(
+                    Recipe.objects.filter(pk=pk), "in_carts_count", 1
                 )
             return Response(
-                "Рецепт уже в корзине", status=status.HTTP_400_BAD_REQUEST
-            )
-        if ShopingCart.objects.filter(user=user, recipe=pk).delete()[0] == 0:
-            return Response(
-                "Рецепта нет в корзине", status=status.HTTP_400_BAD_REQUEST
+                ShopingCartSerializer(recipe).data,
+                status=status.HTTP_201_CREATED,
             )
+        with transaction.atomic():
+            if not ShopingCart.relations.remove(user, pk):
+                return Response(
+                    "Рецепта нет в корзине",
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            ShoppingListItem.objects.remove_recipe(user, pk)
+            change_counter(Recipe.objects.filter(pk=pk), "in_carts_count", -1)
         return Response(
             "Рецепт удален из корзины", status=status.HTTP_204_NO_CONTENT
         )
@@ -115,48 +185,56 @@ class DownloadShopCartView(APIView):
     http_method_names = ["get"]
     pagination_class = None
 
+    renderer_classes = (
+        ShoppingListTextRenderer,
+        ShoppingListCSVRenderer,
+        ShoppingListJSONRenderer,
+    )
+
     def get(self, request):
         user = request.user
         ingredients = (
-            RecipeIngredient.objects.filter(
-                recipes__shopping_recipe__user=user
+            ShoppingListItem.objects.filter(user=user)
+            .values(
+                name=F("ingredient__name"),
+                measurement_unit=F("ingredient__measurement_unit"),
+                total=F("amount"),
             )
-            .values("ingredients__name", "ingredients__measurement_unit")
-            .annotate(amount=Sum("amount"))
+            .order_by("name", "measurement_unit")
+        )
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator()),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
         )
-        buffer_data = self.write_to_buffer(ingredients=ingredients)
-        response = HttpResponse(buffer_data, content_type="StringIO/plain")
         return response
 
-    def write_to_buffer(self, ingredients):
-        in_memory = io.StringIO()
-        for ingredient in ingredients:
-            in_memory.write(
-                "{name}({measurement_unit}) - {amount}\n".format(
-                    name=ingredient.get("ingredients__name"),
-                    measurement_unit=ingredient.get(
-                        "ingredients__measurement_unit"
-                    ),
-                    amount=ingredient.get("amount"),
-                )
-            )
-        return in_memory.getvalue()
+
+def subscriptions_page(request):
+    """A page of the user's subscriptions with their latest recipes."""
+    paginator = SubscriptionsPagination()
+    follow = Follow.objects.filter(user=request.user).select_related("author")
+    page = paginator.paginate_queryset(follow, request)
+    recipes = {}
+    for recipe in Recipe.objects.latest_for_authors(
+        [item.author_id for item in page], get_recipes_limit(request)
+    ):
+        recipes.setdefault(recipe.author_id, []).append(recipe)
+    serializer = FollowSerializer(
+        page, context={"request": request, "recipes": recipes}, many=True
+    )
+    return paginator.get_paginated_response(serializer.data)
 
 
-class SubscriptionsApiView(APIView, PageNumberPagination):
+class SubscriptionsApiView(APIView):
     permission_classes = [IsAuthenticated]
     http_method_names = ["get"]
 
     def get(self, request):
-        user = request.user
-        follow = Follow.objects.filter(user=user).annotate(
-            recipes_count=Count("author__recipe")
-        )
-        page = self.paginate_queryset(follow, request, view=self)
-        serializer = FollowSerializer(
-            page, context={"request": request}, many=True
-        )
-        return self.get_paginated_response(serializer.data)
+        return subscriptions_page(request)
 
 
 class SubscribeApiView(APIView):
@@ -172,13 +250,27 @@ class SubscribeApiView(APIView):
                 "Нельзя подписаться на себя",
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        if not Follow.objects.filter(user=user, author=author).exists():
-            Follow.objects.create(user=user, author=author)
-            query = Follow.objects.filter(user=user).annotate(
-                recipes_count=Count("author__recipe")
+        with transaction.atomic():
+            followed = Follow.relations.add(user, author.pk)
+            if followed:
+                change_counter(
+                    CustomUser.objects.filter(pk=author.pk),
+                    "followers_count",
+                    1,
+                )
+                FeedEntry.objects.backfill(user, author)
+        if followed:
+            if request.query_params.get("full") in ("1", "true"):
+                # The first page of the list; its links lead to the list.
+                response = subscriptions_page(request)
+                response.status_code = status.HTTP_201_CREATED
+                return response
+            recipes = Recipe.objects.latest_for_authors(
+                [author.pk], get_recipes_limit(request)
             )
-            serializer = FollowSerializerPost(
-                query, context={"request": request}, many=True
+            serializer = FollowSerializer(
+                Follow(user=user, author=author),
+                context={"request": request, "recipes": {author.pk: recipes}},
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(
@@ -188,18 +280,24 @@ class SubscribeApiView(APIView):
 
     def delete(self, request, pk):
         user = request.user
-        if Follow.objects.filter(user=user, author=pk).delete()[0] == 0:
-            return Response(
-                "Вы не подписаны на этого пользователя",
-                status=status.HTTP_400_BAD_REQUEST,
+        with transaction.atomic():
+            if not Follow.relations.remove(user, pk):
+                return Response(
+                    "Вы не подписаны на этого пользователя",
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            change_counter(
+                CustomUser.objects.filter(pk=pk), "followers_count", -1
             )
+            FeedEntry.objects.filter(user=user, author=pk).delete()
         return Response(
             "Вы отписались от автора",
             status=status.HTTP_204_NO_CONTENT,
         )
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(ReferenceCacheMixin, viewsets.ModelViewSet):
+    version_name = INGREDIENTS
     serializer_class = IngredientsSerializer
     queryset = Ingredient.objects.all()
     permission_classes = [AllowAny]
@@ -211,8 +309,19 @@ class IngredientViewSet(viewsets.ModelViewSet):
     class Meta:
         ordering = ["name"]
 
+    def get_list_response(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        if name and set(request.query_params) == {"name"}:
+            return Response(
+                ingredient_index.search(
+                    name, limit=settings.INGREDIENT_SEARCH_LIMIT
+                )
+            )
+        return super().get_list_response(request, *args, **kwargs)
+
 
-class TagsViewSet(viewsets.ModelViewSet):
+class TagsViewSet(ReferenceCacheMixin, viewsets.ModelViewSet):
+    version_name = TAGS
     serializer_class = TagsSerializer
     queryset = Tag.objects.all()
     permission_classes = [AllowAny]
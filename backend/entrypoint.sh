@@ -2,9 +2,21 @@
 set -e
 
 
-python manage.py migrate
+# Tag slugs, ingredient names, subscriptions and cart entries are unique
+# since the upgrade; merge the duplicates left behind before migrate adds
+# the constraints.
+python manage.py dedupe_reference_data
+# Databases created before the migrations were committed already have the
+# initial tables; --fake-initial marks those migrations as applied.
+python manage.py migrate --fake-initial
+# Fill the denormalized tables added by upgrades; set DEPLOY_BACKFILL=False
+# to skip the check on restarts of a database known to be consistent.
+DEPLOY_BACKFILL=${DEPLOY_BACKFILL:-True}
+if [ "${DEPLOY_BACKFILL,,}" = "true" ]; then
+    python manage.py backfill
+fi
 python manage.py collectstatic
 cp -r /app/collected_static/. /backend_static/static/
 
 
-exec "$@"
\ No newline at end of file
+exec "$@"
@@ -1,10 +1,56 @@
 from django.contrib import admin
+from django.db import transaction
 
 from .models import (
-    Favorite, Follow, Ingredient, Recipe, RecipeIngredient, ShopingCart, Tag,
+    Favorite, Follow, Ingredient, Recipe, RecipeIngredient, ShopingCart,
+    ShoppingListItem, Tag,
 )
 
 
+def cart_user_ids(recipe_id):
+    return list(
+        ShopingCart.objects.filter(recipe_id=recipe_id).values_list(
+            "user_id", flat=True
+        )
+    )
+
+
+class ShoppingListAdmin(admin.ModelAdmin):
+    """Keeps the shopping list totals in step with the rows edited here.
+
+    ``shares`` returns the users and the {ingredient id: amount} a row adds
+    to their totals.
+    """
+
+    def shares(self, obj):
+        raise NotImplementedError
+
+    def withdraw(self, obj):
+        user_ids, amounts = self.shares(obj)
+        ShoppingListItem.objects.apply(
+            user_ids,
+            {ingredient: -amount for ingredient, amount in amounts.items()},
+        )
+
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        if change:
+            self.withdraw(self.model.objects.get(pk=obj.pk))
+        super().save_model(request, obj, form, change)
+        ShoppingListItem.objects.apply(*self.shares(obj))
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        self.withdraw(obj)
+        super().delete_model(request, obj)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.withdraw(obj)
+        super().delete_queryset(request, queryset)
+
+
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = (
@@ -28,7 +74,7 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @admin.display(description="count_recipe")
     def count_recipe(self, recipe):
-        return Favorite.objects.filter(recipe=recipe).count()
+        return recipe.favorites_count
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -73,7 +119,7 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(RecipeIngredient)
-class RecipeIngredientAdmin(admin.ModelAdmin):
+class RecipeIngredientAdmin(ShoppingListAdmin):
     list_display = (
         "ingredients",
         "recipes",
@@ -81,19 +127,45 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
     )
     search_fields = ("ingredients__name", "recipes__name")
 
+    def shares(self, recipe_ingredient):
+        return cart_user_ids(recipe_ingredient.recipes_id), {
+            recipe_ingredient.ingredients_id: recipe_ingredient.amount
+        }
+
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         return qs.select_related("ingredients", "recipes")
 
 
 @admin.register(ShopingCart)
-class ShopingCartAdmin(admin.ModelAdmin):
+class ShopingCartAdmin(ShoppingListAdmin):
     list_display = (
         "user",
         "recipe",
     )
     search_fields = ("user__username", "recipe__name")
 
+    def shares(self, cart):
+        if cart.recipe_id is None:
+            return [], {}
+        return [cart.user_id], ShoppingListItem.objects.recipe_amounts(
+            cart.recipe_id
+        )
+
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         return qs.select_related("recipe", "user")
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = (
+        "user",
+        "ingredient",
+        "amount",
+    )
+    search_fields = ("user__username", "ingredient__name")
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related("ingredient", "user")
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class FoodgramConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "foodgram"
+
+    def ready(self):
+        from .signals import create_search_indexes
+
+        post_migrate.connect(create_search_indexes, sender=self)
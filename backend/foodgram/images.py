@@ -0,0 +1,45 @@
+import os
+from io import BytesIO
+
+from PIL import Image, ImageOps, features
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+THUMBNAIL_FORMATS = (("JPEG", "jpg", ""), ("WEBP", "webp", "_webp"))
+
+
+def generate_thumbnails(recipe):
+    """Save downscaled copies of the recipe image and store their names.
+
+    Every size of RECIPE_THUMBNAIL_SIZES is written as JPEG and, when
+    Pillow is built with WebP support, as WebP.
+    """
+    storage = recipe.image.storage
+    stem = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    thumbnails = {}
+    with recipe.image.open("rb") as source, Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for size_name, size in settings.RECIPE_THUMBNAIL_SIZES.items():
+            thumbnail = image.copy()
+            thumbnail.thumbnail(size, Image.LANCZOS)
+            for image_format, extension, suffix in THUMBNAIL_FORMATS:
+                if image_format == "WEBP" and not features.check("webp"):
+                    continue
+                buffer = BytesIO()
+                thumbnail.save(
+                    buffer,
+                    image_format,
+                    quality=settings.RECIPE_THUMBNAIL_QUALITY,
+                )
+                thumbnails[size_name + suffix] = storage.save(
+                    f"recipes/thumbnails/{stem}_{size_name}.{extension}",
+                    ContentFile(buffer.getvalue()),
+                )
+    recipe.thumbnails = thumbnails
+    recipe.updated = timezone.now()
+    type(recipe).objects.filter(pk=recipe.pk).update(
+        thumbnails=recipe.thumbnails, updated=recipe.updated
+    )
+    return thumbnails
@@ -0,0 +1,49 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from foodgram.management.commands.reconcile_counters import COUNTERS, count_of
+from foodgram.models import FeedEntry, Follow, ShopingCart, ShoppingListItem
+
+
+def shopping_list_missing():
+    return (
+        ShopingCart.objects.exists()
+        and not ShoppingListItem.objects.exists()
+    )
+
+
+def counters_drifted():
+    return any(
+        model.objects.annotate(actual=count_of(queryset, field))
+        .exclude(**{counter: F("actual")})
+        .exists()
+        for model, counter, queryset, field in COUNTERS
+    )
+
+
+def feed_missing():
+    return Follow.objects.exists() and not FeedEntry.objects.exists()
+
+
+# (description, is the backfill needed, command) in the order they run.
+STEPS = (
+    ("shopping list totals", shopping_list_missing, "rebuild_shopping_list"),
+    ("counters", counters_drifted, "reconcile_counters"),
+    ("feed timelines", feed_missing, "rebuild_feed"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the denormalized tables that an upgraded database lacks. "
+        "Safe to run on every deploy: filled tables are left alone."
+    )
+
+    def handle(self, *args, **options):
+        for description, needed, command in STEPS:
+            if needed():
+                self.stdout.write(f"Backfilling {description}")
+                call_command(command, stdout=self.stdout)
+            else:
+                self.stdout.write(f"The {description} are up to date")
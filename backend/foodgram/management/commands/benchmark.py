@@ -0,0 +1,265 @@
+import io
+import json
+import platform
+import statistics
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from itertools import count, cycle
+
+from rest_framework.authtoken.models import Token
+
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from foodgram.models import Ingredient, Recipe, Tag
+from users.models import CustomUser
+
+
+def comma_separated(value):
+    return [int(item) for item in value.split(",")]
+
+
+def percentile(quantiles, rank):
+    return round(quantiles[rank - 1] * 1000, 2)
+
+
+class LocalTarget:
+    """Requests through the Django test client, inside this process."""
+
+    def __init__(self, token):
+        self.headers = {}
+        if token:
+            self.headers["HTTP_AUTHORIZATION"] = f"Token {token}"
+        self.local = threading.local()
+
+    def get(self, path, auth):
+        if not hasattr(self.local, "client"):
+            self.local.client = Client()
+        response = self.local.client.get(
+            path, **(self.headers if auth else {})
+        )
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response.status_code
+
+
+class RemoteTarget:
+    """Requests over HTTP to an already running server."""
+
+    def __init__(self, url, token):
+        self.url = url.rstrip("/")
+        self.headers = {"Authorization": f"Token {token}"} if token else {}
+
+    def get(self, path, auth):
+        request = urllib.request.Request(
+            self.url + path, headers=self.headers if auth else {}
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency percentiles and throughput of the hot endpoints "
+        "and write a JSON report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=comma_separated,
+            default=[1000, 10000],
+            help="Recipes in each generated dataset.",
+        )
+        parser.add_argument(
+            "--concurrency", type=comma_separated, default=[1, 4, 16]
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Measured requests per endpoint and concurrency level.",
+        )
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--url",
+            help="Benchmark a running server and its data instead of "
+            "generated datasets.",
+        )
+        parser.add_argument(
+            "--token", help="Auth token of the user, required with --url."
+        )
+        parser.add_argument("--output", help="Report file, stdout if unset.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        results = []
+        if options["url"]:
+            if not options["token"]:
+                raise CommandError("--token is required with --url.")
+            target = RemoteTarget(options["url"], options["token"])
+            results.extend(self.run(target, "live"))
+        else:
+            for size in options["sizes"]:
+                results.extend(self.run_dataset(size))
+        report = {"meta": self.meta(), "results": results}
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf8") as file:
+                file.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+    def run_dataset(self, size):
+        """Benchmark a throwaway test database seeded with ``size`` recipes."""
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            self.stderr.write(f"Seeding {size} recipes...")
+            call_command(
+                "seed_load",
+                recipes=size,
+                users=max(10, size // 10),
+                seed=self.options["seed"],
+                stdout=io.StringIO(),
+            )
+            user = (
+                CustomUser.objects.annotate(
+                    relations=Count("follower", distinct=True)
+                    + Count("shoper", distinct=True)
+                )
+                .order_by("-relations", "pk")
+                .first()
+            )
+            token, _ = Token.objects.get_or_create(user=user)
+            return self.run(LocalTarget(token.key), size)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def endpoints(self):
+        """(name, paths to cycle through, needs auth) of the hot endpoints."""
+        slugs = Tag.objects.values_list("slug", flat=True)[:2]
+        tags = "&".join(f"tags={slug}" for slug in slugs)
+        recipes = Recipe.objects.order_by("-favorites_count").values_list(
+            "pk", flat=True
+        )[:50]
+        prefixes = {
+            name[:2].lower()
+            for name in Ingredient.objects.values_list("name", flat=True)[
+                :200
+            ]
+        }
+        return (
+            ("recipes", [f"/api/recipes/?{tags}"], False),
+            ("recipe_detail", [f"/api/recipes/{pk}/" for pk in recipes], True),
+            (
+                "ingredient_search",
+                [f"/api/ingredients/?name={prefix}" for prefix in prefixes],
+                False,
+            ),
+            ("subscriptions", ["/api/users/subscriptions/"], True),
+            ("feed", ["/api/recipes/feed/"], True),
+            (
+                "download_shopping_cart",
+                ["/api/recipes/download_shopping_cart/"],
+                True,
+            ),
+        )
+
+    def run(self, target, size):
+        results = []
+        for name, paths, auth in self.endpoints():
+            for concurrency in self.options["concurrency"]:
+                cache.clear()
+                paths_cycle = cycle(paths)
+                for _ in range(self.options["warmup"]):
+                    target.get(next(paths_cycle), auth)
+                result = {
+                    "size": size,
+                    "endpoint": name,
+                    "concurrency": concurrency,
+                    **self.measure(target, paths, auth, concurrency),
+                }
+                self.stderr.write(
+                    f"{size} {name} x{concurrency}: "
+                    f"{result['rps']} rps, p95 {result['p95_ms']} ms"
+                )
+                results.append(result)
+        return results
+
+    def measure(self, target, paths, auth, concurrency):
+        total = self.options["requests"]
+        issued = count()
+        lock = threading.Lock()
+        paths_cycle = cycle(paths)
+        latencies, errors = [], []
+
+        def worker():
+            while next(issued) < total:
+                with lock:
+                    path = next(paths_cycle)
+                started = time.perf_counter()
+                status = target.get(path, auth)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    if status >= 400:
+                        errors.append(status)
+
+        threads = [
+            threading.Thread(target=worker) for _ in range(concurrency)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+        quantiles = statistics.quantiles(latencies, n=100)
+        return {
+            "requests": len(latencies),
+            "errors": len(errors),
+            "rps": round(len(latencies) / wall, 1),
+            "p50_ms": percentile(quantiles, 50),
+            "p95_ms": percentile(quantiles, 95),
+            "p99_ms": percentile(quantiles, 99),
+        }
+
+    def meta(self):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "commit": commit,
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "requests": self.options["requests"],
+            "warmup": self.options["warmup"],
+            "seed": self.options["seed"],
+        }
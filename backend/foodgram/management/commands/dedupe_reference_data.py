@@ -0,0 +1,107 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, F, Min
+
+from foodgram.models import (
+    Follow, Ingredient, RecipeIngredient, RecipeTag, ShopingCart,
+    ShoppingListItem, Tag,
+)
+
+# (model, reference field, owner field, amount field merged on collision)
+REFERENCES = {
+    Ingredient: (
+        (RecipeIngredient, "ingredients", "recipes", "amount"),
+        (ShoppingListItem, "ingredient", "user", "amount"),
+    ),
+    Tag: ((RecipeTag, "tag", "recipe", None),),
+}
+NATURAL_KEYS = {
+    Ingredient: ("name", "measurement_unit"),
+    Tag: ("slug",),
+}
+# Relations that are unique since the upgrade; copies of a row are deleted.
+UNIQUE_ROWS = (
+    (Follow, ("user", "author")),
+    (ShopingCart, ("user", "recipe")),
+    (RecipeTag, ("recipe", "tag")),
+)
+
+
+def duplicate_groups(model, fields):
+    """Yield (kept id, duplicate ids) for rows sharing ``fields``."""
+    groups = (
+        model.objects.values(*fields)
+        .annotate(keep=Min("pk"), copies=Count("pk"))
+        .filter(copies__gt=1)
+        .order_by()
+    )
+    for group in groups:
+        keep = group.pop("keep")
+        del group["copies"]
+        yield keep, list(
+            model.objects.filter(**group)
+            .exclude(pk=keep)
+            .values_list("pk", flat=True)
+        )
+
+
+def remap(model, field, owner, amount, keep, duplicates):
+    """Point the rows of ``model`` at ``keep`` instead of ``duplicates``.
+
+    A row whose owner already refers to ``keep`` is merged into that row:
+    its ``amount`` is added, then the row is deleted.
+    """
+    rows = model.objects.filter(**{f"{field}__in": duplicates}).values_list(
+        "pk", owner, amount or "pk"
+    )
+    for pk, owner_id, value in rows:
+        kept = model.objects.filter(**{owner: owner_id, field: keep})
+        if not kept.exists():
+            model.objects.filter(pk=pk).update(**{field: keep})
+            continue
+        if amount:
+            kept.update(**{amount: F(amount) + value})
+        model.objects.filter(pk=pk).delete()
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge duplicate tags, ingredients, subscriptions, shopping cart "
+        "entries and recipe tags before their unique constraints are "
+        "applied. "
+        "Run before migrate."
+    )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        tables = set(connection.introspection.table_names())
+        for model, fields in NATURAL_KEYS.items():
+            if model._meta.db_table not in tables:
+                continue
+            merged = 0
+            for keep, duplicates in duplicate_groups(model, fields):
+                for reference in REFERENCES[model]:
+                    if reference[0]._meta.db_table in tables:
+                        remap(*reference, keep, duplicates)
+                # Nothing refers to the duplicates any more, and the
+                # tables of newer relations may not exist yet, so skip the
+                # cascade collector.
+                merged += model.objects.filter(pk__in=duplicates)._raw_delete(
+                    connection.alias
+                )
+            self.stdout.write(
+                f"{model._meta.model_name}: {merged} duplicates merged"
+            )
+        for model, fields in UNIQUE_ROWS:
+            if model._meta.db_table not in tables:
+                continue
+            removed = 0
+            for keep, duplicates in duplicate_groups(model, fields):
+                # The delete signals update counters the database may not
+                # have yet; backfill reconciles them after migrate.
+                removed += model.objects.filter(
+                    pk__in=duplicates
+                )._raw_delete(connection.alias)
+            self.stdout.write(
+                f"{model._meta.model_name}: {removed} duplicates removed"
+            )
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodgram.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = "Recreate the feed timelines from the follows."
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        with transaction.atomic():
+            created = FeedEntry.objects.rebuild()
+        self.stdout.write(
+            f"Rebuilt {created} feed entries "
+            f"({time.monotonic() - started:.2f}s)"
+        )
@@ -0,0 +1,96 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from foodgram.models import RecipeIngredient, ShoppingListItem
+
+
+def raw_totals():
+    """(user, ingredient, amount) computed from the carts, ordered."""
+    return (
+        RecipeIngredient.objects.filter(
+            recipes__shopping_recipe__user__isnull=False
+        )
+        .values_list("recipes__shopping_recipe__user", "ingredients")
+        .annotate(total=Sum("amount"))
+        .order_by("recipes__shopping_recipe__user", "ingredients")
+        .iterator()
+    )
+
+
+def stored_totals():
+    return (
+        ShoppingListItem.objects.values_list("user", "ingredient", "amount")
+        .order_by("user", "ingredient")
+        .iterator()
+    )
+
+
+def find_drift(expected, stored):
+    """Yield (user, ingredient, expected, stored) for every mismatch."""
+    expected, stored = iter(expected), iter(stored)
+    left, right = next(expected, None), next(stored, None)
+    while left is not None or right is not None:
+        if right is None or (left is not None and left[:2] < right[:2]):
+            yield left[0], left[1], left[2], None
+            left = next(expected, None)
+        elif left is None or right[:2] < left[:2]:
+            yield right[0], right[1], None, right[2]
+            right = next(stored, None)
+        else:
+            if left[2] != right[2]:
+                yield left[0], left[1], left[2], right[2]
+            left, right = next(expected, None), next(stored, None)
+
+
+class Command(BaseCommand):
+    help = "Rebuild and verify the per-user shopping list totals."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report the drift, do not rebuild.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if not options["check"]:
+            self.rebuild(options["batch_size"])
+        drift = 0
+        for user, ingredient, expected, stored in find_drift(
+            raw_totals(), stored_totals()
+        ):
+            drift += 1
+            self.stdout.write(
+                f"user={user} ingredient={ingredient}: "
+                f"expected {expected}, stored {stored}"
+            )
+        elapsed = time.monotonic() - started
+        if drift:
+            raise CommandError(f"{drift} totals differ ({elapsed:.2f}s)")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Shopping list totals are consistent ({elapsed:.2f}s)"
+            )
+        )
+
+    @transaction.atomic
+    def rebuild(self, batch_size):
+        ShoppingListItem.objects.all().delete()
+        batch = []
+        created = 0
+        for user, ingredient, amount in raw_totals():
+            batch.append(
+                ShoppingListItem(
+                    user_id=user, ingredient_id=ingredient, amount=amount
+                )
+            )
+            if len(batch) == batch_size:
+                created += len(ShoppingListItem.objects.bulk_create(batch))
+                batch = []
+        created += len(ShoppingListItem.objects.bulk_create(batch))
+        self.stdout.write(f"Rebuilt {created} shopping list totals")
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from foodgram.models import Favorite, Follow, Recipe, ShopingCart
+from users.models import CustomUser
+
+
+def count_of(queryset, field):
+    """Subquery counting the rows of ``queryset`` pointing at OuterRef."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+COUNTERS = (
+    (CustomUser, "recipes_count", Recipe.objects.all(), "author"),
+    (CustomUser, "followers_count", Follow.objects.all(), "author"),
+    (Recipe, "favorites_count", Favorite.objects.all(), "recipe"),
+    (Recipe, "in_carts_count", ShopingCart.objects.all(), "recipe"),
+)
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized counters and fix the drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report the drift, do not fix it.",
+        )
+
+    def handle(self, *args, **options):
+        for model, counter, queryset, field in COUNTERS:
+            started = time.monotonic()
+            actual = count_of(queryset, field)
+            drifted = (
+                model.objects.annotate(actual=actual)
+                .exclude(**{counter: F("actual")})
+                .count()
+            )
+            fix = drifted and not options["check"]
+            if fix:
+                model.objects.update(**{counter: actual})
+            self.stdout.write(
+                f"{model._meta.model_name}.{counter}: {drifted} rows drifted"
+                f"{', fixed' if fix else ''} "
+                f"({time.monotonic() - started:.2f}s)"
+            )
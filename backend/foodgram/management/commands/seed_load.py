@@ -0,0 +1,255 @@
+import io
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from PIL import Image
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api.v1.cache import RECIPES, bump_version
+from foodgram.management.commands.db_upload import batched
+from foodgram.models import (
+    Favorite, Follow, Ingredient, Recipe, RecipeIngredient, RecipeTag,
+    ShopingCart, Tag,
+)
+from users.models import CustomUser
+
+PLACEHOLDER_IMAGE = "recipes/images/seed.jpg"
+WORDS = (
+    "суп", "салат", "пирог", "каша", "рагу", "омлет", "паста", "плов",
+    "запеканка", "блины", "котлеты", "жаркое", "домашний", "быстрый",
+    "острый", "летний", "овощной", "сырный", "грибной", "куриный",
+)
+
+
+@contextmanager
+def explicit_timestamps(model):
+    """Let bulk_create keep the dates set on the instances."""
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False)
+        or getattr(field, "auto_now_add", False)
+    ]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def skewed_sample(rng, population, cum_weights, k):
+    """Up to ``k`` distinct items, popular ones more likely."""
+    k = min(k, len(population) // 2)
+    chosen = set()
+    while len(chosen) < k:
+        chosen.update(
+            rng.choices(population, cum_weights=cum_weights, k=k - len(chosen))
+        )
+    return chosen
+
+
+def zipf_weights(size):
+    return list(accumulate(1 / rank for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic synthetic dataset for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument(
+            "--authors",
+            type=float,
+            default=0.2,
+            help="Share of the users that publish recipes.",
+        )
+        parser.add_argument(
+            "--ingredients-per-recipe", type=int, default=8
+        )
+        parser.add_argument("--tags-per-recipe", type=int, default=2)
+        parser.add_argument(
+            "--follows", type=int, default=10, help="Average per user."
+        )
+        parser.add_argument(
+            "--favorites", type=int, default=20, help="Average per user."
+        )
+        parser.add_argument(
+            "--cart", type=int, default=5, help="Average per user."
+        )
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--password", default="seed-password")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        if not (Ingredient.objects.exists() and Tag.objects.exists()):
+            call_command("db_upload", stdout=self.stdout)
+        self.ingredients = list(
+            Ingredient.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        self.tags = list(
+            Tag.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        self.image = self.placeholder_image()
+        with transaction.atomic():
+            users = self.load(
+                CustomUser,
+                self.users(options["users"], options["password"]),
+            )
+            authors = users[: max(1, int(len(users) * options["authors"]))]
+            with explicit_timestamps(Recipe):
+                recipes = self.load(
+                    Recipe,
+                    self.recipes(options["recipes"], authors, options["days"]),
+                )
+            self.load(
+                RecipeIngredient,
+                self.recipe_ingredients(
+                    recipes, options["ingredients_per_recipe"]
+                ),
+            )
+            self.load(
+                RecipeTag,
+                self.recipe_tags(recipes, options["tags_per_recipe"]),
+            )
+            for model, field, targets, average in (
+                (Follow, "author_id", authors, options["follows"]),
+                (Favorite, "recipe_id", recipes, options["favorites"]),
+                (ShopingCart, "recipe_id", recipes, options["cart"]),
+            ):
+                self.load(
+                    model,
+                    (
+                        model(user_id=user, **{field: target})
+                        for user, target in self.pairs(
+                            users, targets, average, model is Follow
+                        )
+                    ),
+                )
+            self.reset_sequences(CustomUser, Recipe)
+        # Counters, shopping list totals and feeds are maintained by the
+        # views, so recompute them for the rows inserted above.
+        call_command("reconcile_counters", stdout=self.stdout)
+        call_command(
+            "rebuild_shopping_list",
+            batch_size=self.batch_size,
+            stdout=self.stdout,
+        )
+        call_command("rebuild_feed", stdout=self.stdout)
+        bump_version(RECIPES)
+
+    def load(self, model, objects):
+        """Bulk insert ``objects`` in batches and return their ids."""
+        started = time.monotonic()
+        ids = []
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch)
+            ids.extend(obj.pk for obj in batch)
+        self.stdout.write(
+            f"{model._meta.model_name}: {len(ids)} rows "
+            f"({time.monotonic() - started:.2f}s)"
+        )
+        return ids
+
+    def reset_sequences(self, *models):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+    def next_id(self, model):
+        return (model.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+
+    def placeholder_image(self):
+        if not default_storage.exists(PLACEHOLDER_IMAGE):
+            buffer = io.BytesIO()
+            Image.new("RGB", (600, 400), (230, 200, 160)).save(
+                buffer, "JPEG"
+            )
+            default_storage.save(
+                PLACEHOLDER_IMAGE, ContentFile(buffer.getvalue())
+            )
+        return PLACEHOLDER_IMAGE
+
+    def users(self, count, password):
+        # Explicit ids, so the rows can be referenced without reading
+        # them back: SQLite does not return ids from bulk_create.
+        password = make_password(password)
+        first_id = self.next_id(CustomUser)
+        for pk in range(first_id, first_id + count):
+            yield CustomUser(
+                pk=pk,
+                username=f"seed{pk}",
+                email=f"seed{pk}@example.com",
+                first_name=f"Имя{pk}",
+                last_name=f"Фамилия{pk}",
+                password=password,
+            )
+
+    def recipes(self, count, authors, days):
+        rng = self.rng
+        weights = zipf_weights(len(authors))
+        now = timezone.now()
+        first_id = self.next_id(Recipe)
+        for pk in range(first_id, first_id + count):
+            pub_date = now - timedelta(seconds=rng.randrange(days * 86400))
+            yield Recipe(
+                pk=pk,
+                author_id=rng.choices(authors, cum_weights=weights)[0],
+                name=" ".join(rng.sample(WORDS, 3)).capitalize(),
+                text=" ".join(rng.choices(WORDS, k=40)),
+                cooking_time=rng.randint(5, 180),
+                image=self.image,
+                pub_date=pub_date,
+                updated=pub_date,
+            )
+
+    def recipe_ingredients(self, recipes, average):
+        rng = self.rng
+        weights = zipf_weights(len(self.ingredients))
+        for recipe in recipes:
+            count = max(1, round(rng.gauss(average, average / 3)))
+            for ingredient in skewed_sample(
+                rng, self.ingredients, weights, count
+            ):
+                yield RecipeIngredient(
+                    recipes_id=recipe,
+                    ingredients_id=ingredient,
+                    amount=rng.randint(1, 500),
+                )
+
+    def recipe_tags(self, recipes, average):
+        rng = self.rng
+        for recipe in recipes:
+            count = min(len(self.tags), rng.randint(1, average * 2 - 1 or 1))
+            for tag in rng.sample(self.tags, count):
+                yield RecipeTag(recipe_id=recipe, tag_id=tag)
+
+    def pairs(self, users, targets, average, exclude_self=False):
+        """(user, target) pairs, ``average`` per user, skewed to the top."""
+        rng = self.rng
+        weights = zipf_weights(len(targets))
+        for user in users:
+            count = round(rng.expovariate(1 / average)) if average else 0
+            chosen = skewed_sample(rng, targets, weights, count)
+            if exclude_self:
+                chosen.discard(user)
+            for target in sorted(chosen):
+                yield user, target
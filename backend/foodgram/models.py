@@ -1,16 +1,66 @@
+from django.conf import settings
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import connections, models, transaction
+from django.db.models import Case, F, UniqueConstraint, Value, When, Window
+from django.db.models.functions import Greatest, RowNumber
 
 from users.models import CustomUser
 
 
+def change_counter(queryset, field, delta):
+    """Atomically add ``delta`` to a counter column without going below 0."""
+    if delta < 0:
+        queryset = queryset.filter(**{f"{field}__gte": -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+class UserRelationManager(models.Manager):
+    """Idempotent add/remove of (user, target) rows like favorites.
+
+    Not a default manager: related managers subclass the default manager
+    and instantiate it without arguments.
+    """
+
+    def __init__(self, target):
+        super().__init__()
+        self.target = target
+
+    def add(self, user, target_id):
+        """Insert the row unless it exists, in a single statement.
+
+        Relies on the (user, target) unique constraint: the INSERT ... ON
+        CONFLICT DO NOTHING is race-free, and the row count tells whether
+        the row was created.
+        """
+        opts = self.model._meta
+        ops = connections[self.db].ops
+        columns = ", ".join(
+            ops.quote_name(opts.get_field(name).column)
+            for name in ("user", self.target)
+        )
+        sql = (
+            f"{ops.insert_statement(ignore_conflicts=True)} "
+            f"{ops.quote_name(opts.db_table)} ({columns}) VALUES (%s, %s) "
+            f"{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}"
+        )
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, [user.pk, target_id])
+            return cursor.rowcount == 1
+
+    def remove(self, user, target_id):
+        """Delete the row with one DELETE, return whether it existed."""
+        return bool(
+            self.filter(user=user, **{self.target: target_id}).delete()[0]
+        )
+
+
 class Tag(models.Model):
     name = models.CharField("Название", max_length=200)
     color = models.CharField("Цвет", max_length=10)
     slug = models.SlugField(
         "Слаг",
         max_length=200,
+        unique=True,
     )
 
     class Meta:
@@ -30,6 +80,20 @@ class Ingredient(models.Model):
     )
 
     class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["name", "measurement_unit"],
+                name="unique_ingredient_name_unit",
+            )
+        ]
+        indexes = [
+            # Prefix search with LIKE 'abc%' in any collation.
+            models.Index(
+                fields=["name"],
+                name="ingredient_name_pattern",
+                opclasses=["varchar_pattern_ops"],
+            )
+        ]
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
 
@@ -37,6 +101,33 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def latest_for_authors(self, author_ids, limit=None):
+        """Latest ``limit`` recipes of each author, fetched in one query."""
+        if not author_ids:
+            return []
+        recipes = self.filter(author_id__in=author_ids).order_by(
+            "-pub_date", "-id"
+        )
+        if limit is None:
+            return list(recipes)
+        ranked = recipes.annotate(
+            recipe_rank=Window(
+                RowNumber(),
+                partition_by=F("author_id"),
+                order_by=(F("pub_date").desc(), F("id").desc()),
+            )
+        )
+        sql, params = ranked.query.sql_with_params()
+        return list(
+            self.raw(
+                f"SELECT * FROM ({sql}) ranked WHERE recipe_rank <= %s "
+                "ORDER BY pub_date DESC, id DESC",
+                (*params, limit),
+            )
+        )
+
+
 class Recipe(models.Model):
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -57,6 +148,9 @@ class Recipe(models.Model):
         blank=False,
         verbose_name="Изображение",
     )
+    thumbnails = models.JSONField(
+        "Миниатюры", default=dict, blank=True, editable=False
+    )
     name = models.CharField(
         "Название",
         max_length=200,
@@ -77,9 +171,25 @@ class Recipe(models.Model):
         related_name="recipe",
     )
     pub_date = models.DateTimeField("Дата добавления", auto_now_add=True)
+    updated = models.DateTimeField("Дата изменения", auto_now=True)
+    favorites_count = models.PositiveIntegerField(
+        "В избранном", default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        "В списках покупок", default=0, editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"], name="recipe_pub_date"),
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="recipe_author_pub_date",
+            ),
+        ]
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
 
@@ -104,7 +214,16 @@ class Follow(models.Model):
         verbose_name="Автор",
     )
 
+    objects = models.Manager()
+    relations = UserRelationManager("author")
+
     class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["user", "author"],
+                name="unique_follow",
+            )
+        ]
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
 
@@ -129,6 +248,9 @@ class Favorite(models.Model):
         verbose_name="Рецепт",
     )
 
+    objects = models.Manager()
+    relations = UserRelationManager("recipe")
+
     class Meta:
         constraints = [
             UniqueConstraint(
@@ -160,7 +282,16 @@ class ShopingCart(models.Model):
         verbose_name="Рецепт",
     )
 
+    objects = models.Manager()
+    relations = UserRelationManager("recipe")
+
     class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["user", "recipe"],
+                name="unique_cart_user_recipe",
+            )
+        ]
         verbose_name = "Список покупок"
         verbose_name_plural = "Списки покупок"
 
@@ -202,8 +333,219 @@ class RecipeTag(models.Model):
     )
 
     class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["recipe", "tag"],
+                name="unique_recipe_tag",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["tag", "recipe"], name="recipetag_tag_recipe")
+        ]
         verbose_name = "Рецепт и Тег"
         verbose_name_plural = "Рецепты и Теги"
 
     def __str__(self):
         return self.recipe
+
+
+class FeedEntryManager(models.Manager):
+    def insert_rows(self, rows):
+        """INSERT ... SELECT the (user, recipe, author, pub_date) ``rows``.
+
+        ``rows`` is a values_list queryset of expressions only, since
+        plain field names are selected before expressions. Rows already in
+        a timeline are skipped. Returns the number of inserted entries.
+        """
+        connection = connections[self.db]
+        ops = connection.ops
+        opts = self.model._meta
+        columns = ", ".join(
+            ops.quote_name(opts.get_field(name).column)
+            for name in ("user", "recipe", "author", "pub_date")
+        )
+        select, params = rows.query.sql_with_params()
+        sql = (
+            f"{ops.insert_statement(ignore_conflicts=True)} "
+            f"{ops.quote_name(opts.db_table)} ({columns}) {select} "
+            f"{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def fan_out(self, recipe):
+        """Add ``recipe`` to the timelines of its author's followers."""
+        return self.insert_rows(
+            Follow.objects.filter(author_id=recipe.author_id).values_list(
+                F("user_id"),
+                Value(recipe.pk),
+                Value(recipe.author_id),
+                Value(recipe.pub_date, output_field=models.DateTimeField()),
+            )
+        )
+
+    def backfill(self, user, author):
+        """Add the latest recipes of a newly followed author."""
+        if author.followers_count > settings.FEED_FANOUT_MAX_FOLLOWERS:
+            return 0
+        latest = Recipe.objects.filter(author=author).order_by(
+            "-pub_date", "-id"
+        )[: settings.FEED_BACKFILL_LIMIT]
+        return self.insert_rows(
+            latest.values_list(
+                Value(user.pk), F("id"), F("author_id"), F("pub_date")
+            )
+        )
+
+    def rebuild(self):
+        """Recreate every timeline from the follows."""
+        self.all().delete()
+        return self.insert_rows(
+            Recipe.objects.filter(
+                author__followers_count__lte=(
+                    settings.FEED_FANOUT_MAX_FOLLOWERS
+                ),
+                author__following__isnull=False,
+            ).values_list(
+                F("author__following__user_id"),
+                F("id"),
+                F("author_id"),
+                F("pub_date"),
+            )
+        )
+
+
+class FeedEntry(models.Model):
+    """A recipe in the timeline of a follower of its author.
+
+    Written when the recipe is published or the author followed, so that
+    reading the feed is a range scan over the user's entries. Recipes of
+    authors with more than FEED_FANOUT_MAX_FOLLOWERS followers are not
+    fanned out and are merged in when the feed is read.
+    """
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="feed",
+        verbose_name="Пользователь",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+        verbose_name="Рецепт",
+    )
+    author = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Автор",
+    )
+    pub_date = models.DateTimeField("Дата добавления")
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["user", "recipe"],
+                name="unique_feed_entry",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-recipe"],
+                name="feed_user_pub_date",
+            ),
+            models.Index(fields=["user", "author"], name="feed_user_author"),
+        ]
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Лента"
+
+    def __str__(self):
+        return f"{self.user} {self.recipe}"
+
+
+class ShoppingListItemManager(models.Manager):
+    def recipe_amounts(self, recipe_id):
+        return dict(
+            RecipeIngredient.objects.filter(recipes_id=recipe_id).values_list(
+                "ingredients_id", "amount"
+            )
+        )
+
+    def add_recipe(self, user, recipe_id):
+        self.apply([user.id], self.recipe_amounts(recipe_id))
+
+    def remove_recipe(self, user, recipe_id):
+        amounts = self.recipe_amounts(recipe_id)
+        self.apply(
+            [user.id],
+            {ingredient: -amount for ingredient, amount in amounts.items()},
+        )
+
+    @transaction.atomic
+    def apply(self, user_ids, deltas):
+        """Add ``deltas`` ({ingredient id: amount}) to the users' totals."""
+        if not user_ids or not any(deltas.values()):
+            return
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, ingredient_id=ingredient, amount=0)
+                for user_id in user_ids
+                for ingredient, delta in deltas.items()
+                if delta > 0
+            ],
+            ignore_conflicts=True,
+        )
+        self.filter(user_id__in=user_ids, ingredient_id__in=deltas).update(
+            amount=Greatest(
+                F("amount")
+                + Case(
+                    *(
+                        When(ingredient_id=ingredient, then=Value(delta))
+                        for ingredient, delta in deltas.items()
+                    ),
+                    default=Value(0),
+                ),
+                Value(0),
+            )
+        )
+        self.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas, amount=0
+        ).delete()
+
+
+class ShoppingListItem(models.Model):
+    """Total amount of an ingredient over the recipes in a user's cart."""
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="shopping_list",
+        verbose_name="Пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="shopping_list",
+        verbose_name="Ингредиент",
+    )
+    amount = models.PositiveIntegerField("Количество")
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_user_ingredient",
+            )
+        ]
+        verbose_name = "Позиция списка покупок"
+        verbose_name_plural = "Позиции списков покупок"
+
+    def __str__(self):
+        return f"{self.user} {self.ingredient} {self.amount}"
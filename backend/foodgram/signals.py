@@ -0,0 +1,18 @@
+from django.db import connections
+
+SEARCH_INDEXES = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # Matches the UPPER(name) LIKE UPPER('%abc%') of icontains lookups.
+    "CREATE INDEX IF NOT EXISTS ingredient_name_trgm "
+    "ON foodgram_ingredient USING gin (UPPER(name) gin_trgm_ops)",
+)
+
+
+def create_search_indexes(using, **kwargs):
+    """Create the trigram indexes, which model Meta can not declare."""
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        for sql in SEARCH_INDEXES:
+            cursor.execute(sql)
@@ -0,0 +1,26 @@
+from django.conf import settings
+
+from jobs.registry import task
+
+from .images import generate_thumbnails
+from .models import FeedEntry, Recipe
+
+
+@task
+def generate_recipe_thumbnails(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is not None and recipe.image:
+        generate_thumbnails(recipe)
+
+
+@task
+def fan_out_recipe(recipe_id):
+    recipe = (
+        Recipe.objects.select_related("author").filter(pk=recipe_id).first()
+    )
+    if (
+        recipe is not None
+        and recipe.author.followers_count
+        <= settings.FEED_FANOUT_MAX_FOLLOWERS
+    ):
+        FeedEntry.objects.fan_out(recipe)
@@ -0,0 +1,236 @@
+"""In-process metrics exposed in the Prometheus text format.
+
+Every worker keeps its own registry and, when METRICS_DIR is set,
+periodically dumps it to ``METRICS_DIR/metrics-<pid>.json``; the
+``/metrics`` view merges the dumps of all the workers.
+"""
+import ipaddress
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+METRICS = {
+    "http_requests_total": ("counter", "Requests by view, method, status."),
+    "http_request_duration_seconds": (
+        "histogram",
+        "Time until the response is returned, by view.",
+    ),
+    "http_request_db_queries": ("histogram", "SQL queries per request."),
+    "http_requests_in_flight": ("gauge", "Requests being processed."),
+    "cache_hits_total": ("counter", "Cache lookups that found the value."),
+    "cache_misses_total": ("counter", "Cache lookups that missed."),
+}
+BUCKETS = {
+    "http_request_duration_seconds": LATENCY_BUCKETS,
+    "http_request_db_queries": QUERY_BUCKETS,
+}
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(float)
+        self.histograms = {}
+        self.flushed = 0
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            self.values[name, tuple(sorted(labels.items()))] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = BUCKETS[name]
+        with self.lock:
+            counts = self.histograms.setdefault(
+                key, [0] * len(buckets) + [0, 0]
+            )
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "pid": os.getpid(),
+                "values": [
+                    [name, labels, value]
+                    for (name, labels), value in self.values.items()
+                ],
+                "histograms": [
+                    [name, labels, counts[:]]
+                    for (name, labels), counts in self.histograms.items()
+                ],
+            }
+
+    def flush(self, force=False):
+        """Dump the registry for the other workers, at most once a period."""
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or (
+            not force and now - self.flushed < settings.METRICS_FLUSH_INTERVAL
+        ):
+            return
+        self.flushed = now
+        path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(f"{path}.tmp", path)
+
+
+registry = Registry()
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Snapshots of this worker and of every dump in METRICS_DIR."""
+    registry.flush(force=True)
+    directory = settings.METRICS_DIR
+    if not directory:
+        return [registry.snapshot()]
+    snapshots = []
+    for name in os.listdir(directory):
+        if name.startswith("metrics-") and name.endswith(".json"):
+            with open(os.path.join(directory, name)) as file:
+                snapshots.append(json.load(file))
+    return snapshots
+
+
+def format_labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join(
+        '{}="{}"'.format(
+            key, str(value).replace("\\", "\\\\").replace('"', '\\"')
+        )
+        for key, value in pairs
+    )
+
+
+def render(snapshots):
+    values = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        alive = pid_alive(snapshot["pid"])
+        for name, labels, value in snapshot["values"]:
+            # Gauges of exited workers are stale, counters stay valid.
+            if METRICS[name][0] == "gauge" and not alive:
+                continue
+            values[name, tuple(map(tuple, labels))] += value
+        for name, labels, counts in snapshot["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [0] * len(counts))
+            for index, count in enumerate(counts):
+                merged[index] += count
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (metric, labels), value in sorted(values.items()):
+            if metric == name:
+                lines.append(f"{name}{format_labels(labels)} {value:g}")
+        for (metric, labels), counts in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(BUCKETS[name], counts):
+                lines.append(
+                    f"{name}_bucket{format_labels(labels, le=bound)} {count}"
+                )
+            lines.append(
+                f"{name}_bucket{format_labels(labels, le='+Inf')} "
+                f"{counts[-1]}"
+            )
+            lines.append(f"{name}_sum{format_labels(labels)} {counts[-2]:g}")
+            lines.append(f"{name}_count{format_labels(labels)} {counts[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def is_internal(request):
+    """Whether the client address is in METRICS_ALLOWED_NETWORKS.
+
+    A missing or unparsable address counts as external.
+    """
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    address = getattr(address, "ipv4_mapped", None) or address
+    return any(
+        address.version == network.version and address in network
+        for network in settings.METRICS_ALLOWED_NETWORKS
+    )
+
+
+def metrics_view(request):
+    if not (request.user.is_staff or is_internal(request)):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render(collect()), content_type="text/plain; version=0.0.4"
+    )
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Count requests, their latency and SQL queries per view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        counter = QueryCounter()
+        registry.inc("http_requests_in_flight")
+        try:
+            with connections["default"].execute_wrapper(counter):
+                response = self.get_response(request)
+        finally:
+            registry.inc("http_requests_in_flight", -1)
+        match = request.resolver_match
+        if match is None:
+            view = "unmatched"
+        else:
+            view = getattr(match.func, "cls", match.func).__name__
+        registry.inc(
+            "http_requests_total",
+            view=view,
+            method=request.method,
+            status=response.status_code,
+        )
+        registry.observe(
+            "http_request_duration_seconds",
+            time.perf_counter() - started,
+            view=view,
+        )
+        registry.observe("http_request_db_queries", counter.count, view=view)
+        registry.flush()
+        return response
@@ -0,0 +1,193 @@
+import contextvars
+import functools
+import logging
+import time
+import traceback
+
+from rest_framework.serializers import BaseSerializer
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger("foodgram.profiling")
+serialization = contextvars.ContextVar("serialization", default=None)
+
+
+def query_origin():
+    """The innermost stack frame in project code, outside this module."""
+    for frame in reversed(traceback.extract_stack()):
+        if (
+            frame.filename.startswith(str(settings.BASE_DIR))
+            and frame.filename != __file__
+            and "site-packages" not in frame.filename
+        ):
+            return f"{frame.filename}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` that times every query."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.count = 0
+        self.duration = 0.0
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            if duration * 1000 >= settings.PROFILING_SLOW_QUERY_MS:
+                self.slow.append((sql, params, many, duration, query_origin()))
+
+
+class SerializationTimer:
+    """Time spent in the outermost ``serializer.data`` calls of a request."""
+
+    def __init__(self):
+        self.duration = 0.0
+        self.depth = 0
+        self.serializers = []
+
+    def measure(self, serializer, data):
+        if self.depth:
+            return data(serializer)
+        self.depth += 1
+        started = time.perf_counter()
+        try:
+            return data(serializer)
+        finally:
+            self.depth -= 1
+            self.duration += time.perf_counter() - started
+            name = type(getattr(serializer, "child", serializer)).__name__
+            if name not in self.serializers:
+                self.serializers.append(name)
+
+
+def time_serialization():
+    """Route ``BaseSerializer.data`` through the request's timer.
+
+    Every serializer's ``data`` ends up in ``BaseSerializer.data``, which
+    runs ``to_representation`` on the whole instance tree.
+    """
+    data = BaseSerializer.data.fget
+    if getattr(data, "timed", False):
+        return
+
+    @functools.wraps(data)
+    def timed_data(serializer):
+        timer = serialization.get()
+        if timer is None:
+            return data(serializer)
+        return timer.measure(serializer, data)
+
+    timed_data.timed = True
+    BaseSerializer.data = property(timed_data)
+
+
+class ProfilingMiddleware:
+    """Report query count, DB, view, serializer and render time.
+
+    Queries slower than PROFILING_SLOW_QUERY_MS are logged with the line
+    of project code that issued them, and with their plan when
+    PROFILING_EXPLAIN is set. Disabled unless PROFILING_ENABLED is set.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        time_serialization()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        request.profiling_view_started = request.profiling_rendered = None
+        timer = SerializationTimer()
+        token = serialization.set(timer)
+        recorders = [QueryRecorder(alias) for alias in connections]
+        wrappers = [
+            connections[recorder.alias].execute_wrapper(recorder)
+            for recorder in recorders
+        ]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            response = self.get_response(request)
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+            serialization.reset(token)
+        total = time.perf_counter() - started
+        response["Server-Timing"] = self.server_timing(
+            request, recorders, timer, started, total
+        )
+        for recorder in recorders:
+            for query in recorder.slow:
+                self.log_slow_query(request, recorder.alias, *query)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.profiling_view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Runs after the view and right before the response is rendered.
+        request.profiling_rendered = time.perf_counter()
+        return response
+
+    def server_timing(self, request, recorders, timer, started, total):
+        queries = sum(recorder.count for recorder in recorders)
+        database = sum(recorder.duration for recorder in recorders)
+        metrics = [("db", database, f"{queries} queries")]
+        view_started = request.profiling_view_started
+        rendered = request.profiling_rendered
+        if view_started is not None:
+            view_finished = rendered or started + total
+            metrics.append(("view", view_finished - view_started, None))
+        if timer.serializers:
+            metrics.append(
+                ("serialize", timer.duration, " ".join(timer.serializers))
+            )
+        if rendered is not None:
+            render = started + total - rendered
+            metrics.append(("render", render, "renderer"))
+        metrics.append(("total", total, None))
+        return ", ".join(
+            f"{name};dur={duration * 1000:.1f}"
+            + (f';desc="{description}"' if description else "")
+            for name, duration, description in metrics
+        )
+
+    def log_slow_query(
+        self, request, alias, sql, params, many, duration, origin
+    ):
+        plan = None
+        if (
+            settings.PROFILING_EXPLAIN
+            and not many
+            and sql.lstrip().upper().startswith("SELECT")
+        ):
+            try:
+                with connections[alias].cursor() as cursor:
+                    prefix = connections[alias].ops.explain_query_prefix()
+                    cursor.execute(f"{prefix} {sql}", params)
+                    plan = "\n".join(
+                        " ".join(str(column) for column in row)
+                        for row in cursor.fetchall()
+                    )
+            except Exception as error:
+                plan = f"EXPLAIN failed: {error}"
+        logger.warning(
+            "Slow query (%.1f ms) on %s %s from %s: %s%s",
+            duration * 1000,
+            request.method,
+            request.path,
+            origin,
+            sql,
+            f"\n{plan}" if plan else "",
+        )
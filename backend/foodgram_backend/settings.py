@@ -1,3 +1,4 @@
+import ipaddress
 import os
 from pathlib import Path
 
@@ -29,9 +30,12 @@ INSTALLED_APPS = [
     "users.apps.UsersConfig",
     "foodgram.apps.FoodgramConfig",
     "api.apps.ApiConfig",
+    "jobs.apps.JobsConfig",
 ]
 
 MIDDLEWARE = [
+    "foodgram_backend.metrics.MetricsMiddleware",
+    "foodgram_backend.middleware.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -73,6 +77,77 @@ DATABASES = {
     }
 }
 
+CACHE_BACKEND = os.getenv(
+    "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+)
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+        # Room for every rendered recipe, plus the stale renderings left
+        # behind by version bumps until they expire.
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 10000)),
+            "CULL_FREQUENCY": int(os.getenv("CACHE_CULL_FREQUENCY", 3)),
+        },
+    },
+    # The version stamps are kept apart, where culling the rendered
+    # recipes cannot evict them.
+    "versions": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": os.getenv("VERSION_CACHE_LOCATION", "versions"),
+    },
+}
+
+RECIPE_CACHE_TIMEOUT = int(os.getenv("RECIPE_CACHE_TIMEOUT", 60 * 60))
+
+LOCAL_CACHE_VERSION_TIMEOUT = int(os.getenv("LOCAL_CACHE_VERSION_TIMEOUT", 60))
+
+INGREDIENT_INDEX_TTL = int(os.getenv("INGREDIENT_INDEX_TTL", 5 * 60))
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv("INGREDIENT_SEARCH_LIMIT", 100))
+
+REFERENCE_CACHE_TIMEOUT = int(
+    os.getenv("REFERENCE_CACHE_TIMEOUT", 24 * 60 * 60)
+)
+
+REFERENCE_CACHE_MAX_AGE = int(os.getenv("REFERENCE_CACHE_MAX_AGE", 60 * 60))
+
+JOBS_EAGER = os.getenv("JOBS_EAGER", "False").lower() in ("true",)
+
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", 3))
+
+JOBS_RETRY_DELAY = int(os.getenv("JOBS_RETRY_DELAY", 10))
+
+JOBS_TIMEOUT = int(os.getenv("JOBS_TIMEOUT", 10 * 60))
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() in (
+    "true",
+)
+
+PROFILING_SLOW_QUERY_MS = float(os.getenv("PROFILING_SLOW_QUERY_MS", 100))
+
+PROFILING_EXPLAIN = os.getenv("PROFILING_EXPLAIN", "False").lower() in (
+    "true",
+)
+
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv("FEED_FANOUT_MAX_FOLLOWERS", 10000))
+
+FEED_BACKFILL_LIMIT = int(os.getenv("FEED_BACKFILL_LIMIT", 100))
+
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+
+METRICS_ALLOWED_NETWORKS = [
+    ipaddress.ip_network(network.strip())
+    for network in os.getenv(
+        "METRICS_ALLOWED_NETWORKS", "127.0.0.1/32, ::1/128"
+    ).split(",")
+    if network.strip()
+]
+
 
 AUTH_USER_MODEL = "users.CustomUser"
 
@@ -111,6 +186,19 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv("RECIPE_IMAGE_MAX_SIZE", 10 * 1024 * 1024)
+)
+
+RECIPE_IMAGE_MAX_PIXELS = int(os.getenv("RECIPE_IMAGE_MAX_PIXELS", 40_000_000))
+
+RECIPE_THUMBNAIL_SIZES = {
+    "card": (480, 360),
+    "detail": (1200, 900),
+}
+
+RECIPE_THUMBNAIL_QUALITY = int(os.getenv("RECIPE_THUMBNAIL_QUALITY", 85))
+
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
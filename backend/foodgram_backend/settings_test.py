@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+os.environ.setdefault("ALLOWED_HOSTS", "testserver")
+
+from .settings import *  # noqa: E402,F401,F403
+
+# The query plan tests only run with TEST_POSTGRES=true, against the
+# PostgreSQL database configured by the POSTGRES_* variables.
+if os.getenv("TEST_POSTGRES", "False").lower() not in ("true",):
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": ":memory:",
+        }
+    }
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "versions": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "versions",
+    },
+}
+
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix="foodgram-media-")
+
+JOBS_EAGER = True
@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        "name",
+        "status",
+        "attempts",
+        "run_after",
+        "updated",
+    )
+    list_filter = ("status", "name")
+    search_fields = ("name",)
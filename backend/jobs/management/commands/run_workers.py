@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = "Run the background jobs queued in the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument(
+            "--pool", choices=("thread", "process"), default="thread"
+        )
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once there are no jobs left to run.",
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options["concurrency"],
+            pool=options["pool"],
+            poll_interval=options["poll_interval"],
+        )
+        self.stdout.write(
+            f"Running jobs with {options['concurrency']} "
+            f"{options['pool']} workers"
+        )
+        try:
+            worker.run(burst=options["burst"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped")
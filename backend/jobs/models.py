@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Выполнена"),
+        (FAILED, "Ошибка"),
+    )
+
+    name = models.CharField("Задача", max_length=200)
+    payload = models.JSONField("Параметры", default=dict, blank=True)
+    status = models.CharField(
+        "Статус", max_length=10, choices=STATUSES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField("Попытки", default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        "Максимум попыток", default=3
+    )
+    run_after = models.DateTimeField("Запустить после", default=timezone.now)
+    created = models.DateTimeField("Дата создания", auto_now_add=True)
+    updated = models.DateTimeField("Дата изменения", auto_now=True)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "run_after"], name="job_status_run_after"
+            )
+        ]
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
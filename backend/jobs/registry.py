@@ -0,0 +1,41 @@
+from django.conf import settings
+
+from .models import Job
+
+tasks = {}
+
+
+class Task:
+    """Function that can be run later by the job workers."""
+
+    def __init__(self, func, name=None, max_attempts=None):
+        self.func = func
+        self.name = name or f"{func.__module__}.{func.__name__}"
+        self.max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def enqueue(self, **kwargs):
+        """Queue the task; it runs right away when JOBS_EAGER is set.
+
+        Jobs are created in the current transaction, so workers only see
+        them once the data they refer to is committed.
+        """
+        if settings.JOBS_EAGER:
+            self.func(**kwargs)
+            return None
+        return Job.objects.create(
+            name=self.name, payload=kwargs, max_attempts=self.max_attempts
+        )
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """Register a function as a task, keyword arguments only."""
+
+    def register(func):
+        registered = Task(func, name=name, max_attempts=max_attempts)
+        tasks[registered.name] = registered
+        return registered
+
+    return register(func) if func is not None else register
@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait,
+)
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+from .registry import tasks
+
+logger = logging.getLogger(__name__)
+
+
+def due_jobs():
+    """Pending jobs ready to run, and running jobs whose worker is gone."""
+    now = timezone.now()
+    return Job.objects.filter(
+        Q(status=Job.PENDING, run_after__lte=now)
+        | Q(
+            status=Job.RUNNING,
+            updated__lt=now - timedelta(seconds=settings.JOBS_TIMEOUT),
+        )
+    )
+
+
+def claim(limit):
+    """Mark up to ``limit`` due jobs as running and return their ids.
+
+    A job is claimed with a conditional UPDATE, so concurrent workers
+    never run the same job twice.
+    """
+    claimed = []
+    candidates = due_jobs().order_by("run_after", "id")[:limit]
+    for job_id in candidates.values_list("id", flat=True):
+        if due_jobs().filter(pk=job_id).update(
+            status=Job.RUNNING,
+            attempts=F("attempts") + 1,
+            updated=timezone.now(),
+        ):
+            claimed.append(job_id)
+    return claimed
+
+
+class Heartbeat:
+    """Keep refreshing ``updated`` of a running job from a thread.
+
+    Without it a job running longer than JOBS_TIMEOUT would be claimed
+    again by another worker.
+    """
+
+    def __init__(self, job_id, interval=None):
+        self.job_id = job_id
+        self.interval = interval or settings.JOBS_TIMEOUT / 4
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.beat, daemon=True)
+
+    def beat(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                Job.objects.filter(pk=self.job_id, status=Job.RUNNING).update(
+                    updated=timezone.now()
+                )
+        except Exception:
+            logger.exception("Heartbeat of job #%s failed", self.job_id)
+        finally:
+            connections.close_all()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def execute(job_id):
+    """Run a claimed job and record its outcome."""
+    close_old_connections()
+    try:
+        job = Job.objects.get(pk=job_id)
+        try:
+            with Heartbeat(job_id):
+                tasks[job.name](**job.payload)
+        except Exception:
+            job.last_error = traceback.format_exc()
+            if job.attempts >= job.max_attempts:
+                job.status = Job.FAILED
+                logger.exception("Job %s failed", job)
+            else:
+                job.status = Job.PENDING
+                job.run_after = timezone.now() + timedelta(
+                    seconds=settings.JOBS_RETRY_DELAY * 2 ** job.attempts
+                )
+                logger.warning("Job %s will be retried", job)
+        else:
+            job.status = Job.DONE
+            job.last_error = ""
+        job.save(
+            update_fields=("status", "run_after", "last_error", "updated")
+        )
+        return job.status
+    finally:
+        close_old_connections()
+
+
+class Worker:
+    def __init__(self, concurrency=4, pool="thread", poll_interval=1.0):
+        self.concurrency = concurrency
+        self.pool = pool
+        self.poll_interval = poll_interval
+
+    def get_executor(self):
+        if self.pool == "process":
+            return ProcessPoolExecutor(max_workers=self.concurrency)
+        return ThreadPoolExecutor(max_workers=self.concurrency)
+
+    def run(self, burst=False):
+        """Run jobs until interrupted, or until the queue is empty."""
+        running = {}
+        with self.get_executor() as executor:
+            while True:
+                free = self.concurrency - len(running)
+                job_ids = claim(free) if free else []
+                if self.pool == "process":
+                    # Children forked on submit must not inherit the
+                    # parent's database connections.
+                    connections.close_all()
+                for job_id in job_ids:
+                    running[executor.submit(execute, job_id)] = job_id
+                if not running:
+                    if burst:
+                        return
+                    time.sleep(self.poll_interval)
+                    continue
+                done, _ = wait(
+                    running,
+                    timeout=self.poll_interval,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception:
+                        # The job stays running and is claimed again
+                        # after JOBS_TIMEOUT.
+                        logger.exception("Worker of job #%s crashed", job_id)
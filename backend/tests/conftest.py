@@ -0,0 +1,111 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+from rest_framework.test import APIClient
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db.models import Count
+
+from foodgram.models import Ingredient, Tag
+from users.models import CustomUser
+
+SIZES = {
+    "small": {"users": 4, "recipes": 4, "follows": 2, "favorites": 2},
+    "large": {"users": 40, "recipes": 120, "follows": 8, "favorites": 20},
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    for backend in caches.all():
+        backend.clear()
+    yield
+    for backend in caches.all():
+        backend.clear()
+
+
+@pytest.fixture(params=SIZES, ids=str)
+def dataset(request, db):
+    """Seeded users, recipes and relations; small and large variants."""
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f"Ингредиент {number}", measurement_unit="г")
+        for number in range(50)
+    )
+    Tag.objects.bulk_create(
+        Tag(name=slug, color="#E26C2D", slug=slug)
+        for slug in ("breakfast", "lunch", "dinner")
+    )
+    size = SIZES[request.param]
+    call_command(
+        "seed_load",
+        users=size["users"],
+        recipes=size["recipes"],
+        follows=size["follows"],
+        favorites=size["favorites"],
+        cart=size["favorites"],
+        seed=0,
+        stdout=io.StringIO(),
+    )
+    return request.param
+
+
+@pytest.fixture
+def user(dataset):
+    """The seeded user with the most subscriptions and cart entries."""
+    return (
+        CustomUser.objects.annotate(
+            relations=Count("follower", distinct=True)
+            + Count("shoper", distinct=True)
+        )
+        .order_by("-relations", "pk")
+        .first()
+    )
+
+
+@pytest.fixture
+def anonymous_client(dataset):
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def new_user(dataset):
+    """A user without recipes, subscriptions, favorites or cart."""
+    return CustomUser.objects.create_user(
+        username="newcomer",
+        email="newcomer@example.com",
+        first_name="Новый",
+        last_name="Пользователь",
+        password="newcomer-password",
+    )
+
+
+@pytest.fixture
+def new_user_client(new_user):
+    client = APIClient()
+    client.force_authenticate(new_user)
+    return client
+
+
+@pytest.fixture(params=["anonymous", "user"])
+def any_client(request, anonymous_client):
+    if request.param == "anonymous":
+        return anonymous_client
+    return request.getfixturevalue("user_client")
+
+
+@pytest.fixture
+def image():
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), (255, 0, 0)).save(buffer, "PNG")
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f"data:image/png;base64,{encoded}"
@@ -0,0 +1,56 @@
+import io
+
+import pytest
+
+from django.contrib.admin.sites import site
+from django.core.management import call_command
+from django.test import RequestFactory
+
+from foodgram.models import (
+    Ingredient, Recipe, RecipeIngredient, ShopingCart, ShoppingListItem,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def assert_totals_consistent():
+    call_command("rebuild_shopping_list", check=True, stdout=io.StringIO())
+
+
+def test_admin_edits_keep_shopping_list(new_user):
+    request = RequestFactory().post("/admin/")
+    recipe = Recipe.objects.filter(recipes_ingredients__isnull=False).first()
+    cart_admin = site._registry[ShopingCart]
+    ingredient_admin = site._registry[RecipeIngredient]
+    assert_totals_consistent()
+
+    cart = ShopingCart(user=new_user, recipe=recipe)
+    cart_admin.save_model(request, cart, None, change=False)
+    assert ShoppingListItem.objects.filter(user=new_user).exists()
+    assert_totals_consistent()
+
+    row = RecipeIngredient.objects.filter(recipes=recipe).first()
+    row.amount += 7
+    ingredient_admin.save_model(request, row, None, change=True)
+    assert_totals_consistent()
+
+    added = RecipeIngredient(
+        recipes=recipe,
+        ingredients=Ingredient.objects.exclude(recipes=recipe).first(),
+        amount=3,
+    )
+    ingredient_admin.save_model(request, added, None, change=False)
+    assert_totals_consistent()
+
+    ingredient_admin.delete_queryset(
+        request, RecipeIngredient.objects.filter(pk=row.pk)
+    )
+    assert_totals_consistent()
+
+    cart.recipe = Recipe.objects.exclude(pk=recipe.pk).first()
+    cart_admin.save_model(request, cart, None, change=True)
+    assert_totals_consistent()
+
+    cart_admin.delete_model(request, cart)
+    assert not ShoppingListItem.objects.filter(user=new_user).exists()
+    assert_totals_consistent()
@@ -0,0 +1,54 @@
+import io
+
+import pytest
+
+from django.core.management import call_command
+
+from foodgram.models import FeedEntry, Follow, ShoppingListItem
+from users.models import CustomUser
+
+pytestmark = pytest.mark.django_db
+
+
+def backfill():
+    output = io.StringIO()
+    call_command("backfill", stdout=output)
+    return output.getvalue()
+
+
+def test_backfill_shopping_list(dataset):
+    expected = set(
+        ShoppingListItem.objects.values_list("user", "ingredient", "amount")
+    )
+    ShoppingListItem.objects.all().delete()
+    assert "Backfilling shopping list totals" in backfill()
+    assert set(
+        ShoppingListItem.objects.values_list("user", "ingredient", "amount")
+    ) == expected
+    assert "shopping list totals are up to date" in backfill()
+
+
+def test_backfill_counters(dataset):
+    expected = dict(
+        CustomUser.objects.values_list("pk", "recipes_count")
+    )
+    CustomUser.objects.update(recipes_count=0, followers_count=0)
+    assert "Backfilling counters" in backfill()
+    assert dict(
+        CustomUser.objects.values_list("pk", "recipes_count")
+    ) == expected
+    assert "counters are up to date" in backfill()
+
+
+def test_backfill_feed(dataset):
+    author = CustomUser.objects.filter(recipes_count__gt=0).first()
+    follower = CustomUser.objects.exclude(pk=author.pk).exclude(
+        follower__author=author
+    )[0]
+    Follow.relations.add(follower, author.pk)
+    FeedEntry.objects.backfill(follower, author)
+    expected = set(FeedEntry.objects.values_list("user", "recipe"))
+    FeedEntry.objects.all().delete()
+    assert "Backfilling feed timelines" in backfill()
+    assert set(FeedEntry.objects.values_list("user", "recipe")) == expected
+    assert "feed timelines are up to date" in backfill()
@@ -0,0 +1,152 @@
+import pytest
+from rest_framework.test import APIClient
+
+from django.core.cache import cache
+
+from api.v1.cache import RECIPES, bump_version, get_version, version_timeout
+from foodgram.models import Ingredient, Tag
+from users.models import CustomUser
+
+
+def file_caches(tmp_path, max_entries=300):
+    return {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(tmp_path / "default"),
+            "OPTIONS": {"MAX_ENTRIES": max_entries, "CULL_FREQUENCY": 2},
+        },
+        "versions": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(tmp_path / "versions"),
+        },
+    }
+
+
+def test_local_cache_versions_expire(settings):
+    settings.LOCAL_CACHE_VERSION_TIMEOUT = 30
+    assert version_timeout() == 30
+
+
+def test_shared_cache_versions_persist(settings, tmp_path):
+    settings.CACHES = file_caches(tmp_path)
+    assert version_timeout() is None
+    version = get_version(RECIPES)
+    assert get_version(RECIPES) == version
+    bump_version(RECIPES)
+    assert get_version(RECIPES) > version
+
+
+def test_culling_keeps_versions(settings, tmp_path):
+    settings.CACHES = file_caches(tmp_path, max_entries=10)
+    version = get_version(RECIPES)
+    for number in range(50):
+        cache.set(f"recipe:{number}", number)
+    assert get_version(RECIPES) == version
+
+
+@pytest.fixture
+def reference_data(db):
+    Tag.objects.create(name="Завтрак", color="#E26C2D", slug="breakfast")
+    Ingredient.objects.create(name="соль", measurement_unit="г")
+
+
+@pytest.mark.parametrize("url", ["/api/tags/", "/api/ingredients/"])
+def test_not_modified(client, reference_data, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    repeated = client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert repeated.status_code == 304
+    assert repeated["ETag"] == response["ETag"]
+
+
+@pytest.mark.parametrize(
+    "url, model, field, value",
+    [
+        ("/api/tags/", Tag, "name", "Обед"),
+        ("/api/ingredients/", Ingredient, "name", "перец"),
+    ],
+)
+def test_save_changes_etag_and_body(
+    client, reference_data, url, model, field, value
+):
+    response = client.get(url)
+    instance = model.objects.get()
+    setattr(instance, field, value)
+    instance.save()
+    changed = client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert changed.status_code == 200
+    assert changed["ETag"] != response["ETag"]
+    assert changed.json()[0][field] == value
+
+
+def first_recipe(client):
+    """The first recipe of the list that has tags and ingredients."""
+    response = client.get("/api/recipes/")
+    assert response.status_code == 200
+    return next(
+        recipe
+        for recipe in response.json()["results"]
+        if recipe["tags"] and recipe["ingredients"]
+    )
+
+
+def rendered(client, pk):
+    results = client.get("/api/recipes/").json()["results"]
+    return next(recipe for recipe in results if recipe["id"] == pk)
+
+
+def test_tag_save_refreshes_recipes(anonymous_client):
+    recipe = first_recipe(anonymous_client)
+    tag = Tag.objects.get(pk=recipe["tags"][0]["id"])
+    tag.name = "Новый тег"
+    tag.save()
+    tags = rendered(anonymous_client, recipe["id"])["tags"]
+    assert "Новый тег" in [tag["name"] for tag in tags]
+
+
+def test_ingredient_save_refreshes_recipes(anonymous_client):
+    recipe = first_recipe(anonymous_client)
+    ingredient = Ingredient.objects.get(pk=recipe["ingredients"][0]["id"])
+    ingredient.name = "Новый ингредиент"
+    ingredient.save()
+    ingredients = rendered(anonymous_client, recipe["id"])["ingredients"]
+    assert "Новый ингредиент" in [item["name"] for item in ingredients]
+
+
+def test_author_save_refreshes_recipes(anonymous_client):
+    recipe = first_recipe(anonymous_client)
+    author = CustomUser.objects.get(pk=recipe["author"]["id"])
+    author.first_name = "Новое имя"
+    author.save()
+    assert (
+        rendered(anonymous_client, recipe["id"])["author"]["first_name"]
+        == "Новое имя"
+    )
+
+
+def test_recipe_patch_refreshes_recipes(anonymous_client):
+    recipe = first_recipe(anonymous_client)
+    client = APIClient()
+    client.force_authenticate(
+        CustomUser.objects.get(pk=recipe["author"]["id"])
+    )
+    response = client.patch(
+        f"/api/recipes/{recipe['id']}/",
+        {
+            "name": "Новое название",
+            "text": recipe["text"],
+            "cooking_time": recipe["cooking_time"],
+            "tags": [tag["id"] for tag in recipe["tags"]],
+            "ingredients": [
+                {"id": item["id"], "amount": item["amount"] + 1}
+                for item in recipe["ingredients"]
+            ],
+        },
+        format="json",
+    )
+    assert response.status_code == 200
+    updated = rendered(anonymous_client, recipe["id"])
+    assert updated["name"] == "Новое название"
+    assert [item["amount"] for item in updated["ingredients"]] == [
+        item["amount"] + 1 for item in recipe["ingredients"]
+    ]
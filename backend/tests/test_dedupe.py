@@ -0,0 +1,129 @@
+import io
+
+import pytest
+
+from django.core.management import call_command
+from django.db import connection
+
+from foodgram.models import (
+    Follow, Ingredient, Recipe, RecipeIngredient, RecipeTag, ShopingCart,
+    ShoppingListItem, Tag,
+)
+from users.models import CustomUser
+
+# Models whose unique constraints the upgrade adds.
+CONSTRAINED = (Ingredient, Follow, ShopingCart, RecipeTag)
+
+
+@pytest.fixture
+def duplicates_allowed(transactional_db):
+    """Drop the unique constraints, as on a database before the upgrade."""
+    constraints = {model: model._meta.constraints for model in CONSTRAINED}
+    slug = Tag._meta.get_field("slug")
+    plain_slug = slug.clone()
+    plain_slug.set_attributes_from_name("slug")
+    plain_slug.model = Tag
+    plain_slug._unique = False
+    # SQLite rebuilds the table from the constraints left in Meta.
+    for model in CONSTRAINED:
+        model._meta.constraints = []
+    try:
+        with connection.schema_editor() as editor:
+            for model, (constraint,) in constraints.items():
+                editor.remove_constraint(model, constraint)
+            editor.alter_field(Tag, slug, plain_slug)
+        yield
+    finally:
+        for model, model_constraints in constraints.items():
+            model._meta.constraints = model_constraints
+    for model in (Follow, ShopingCart, RecipeTag, Ingredient, Tag):
+        model.objects.all().delete()
+    with connection.schema_editor() as editor:
+        for model, (constraint,) in constraints.items():
+            editor.add_constraint(model, constraint)
+        editor.alter_field(Tag, plain_slug, slug)
+
+
+def test_dedupe_reference_data(duplicates_allowed):
+    user = CustomUser.objects.create(username="cook", email="cook@a.ru")
+    salt, salt_copy, pepper = (
+        Ingredient.objects.create(name=name, measurement_unit="г")
+        for name in ("соль", "соль", "перец")
+    )
+    tag, tag_copy = (
+        Tag.objects.create(name=name, color="#E26C2D", slug="soup")
+        for name in ("Суп", "Супы")
+    )
+    both, copy_only = (
+        Recipe.objects.create(
+            author=user, name=name, text=name, cooking_time=1, image="a.jpg"
+        )
+        for name in ("both", "copy only")
+    )
+    RecipeIngredient.objects.bulk_create(
+        [
+            RecipeIngredient(recipes=both, ingredients=salt, amount=10),
+            RecipeIngredient(recipes=both, ingredients=salt_copy, amount=5),
+            RecipeIngredient(recipes=both, ingredients=pepper, amount=1),
+            RecipeIngredient(
+                recipes=copy_only, ingredients=salt_copy, amount=3
+            ),
+        ]
+    )
+    RecipeTag.objects.bulk_create(
+        [
+            RecipeTag(recipe=both, tag=tag),
+            RecipeTag(recipe=both, tag=tag_copy),
+            RecipeTag(recipe=copy_only, tag=tag_copy),
+        ]
+    )
+    ShoppingListItem.objects.bulk_create(
+        [
+            ShoppingListItem(user=user, ingredient=salt, amount=10),
+            ShoppingListItem(user=user, ingredient=salt_copy, amount=8),
+        ]
+    )
+
+    call_command("dedupe_reference_data", stdout=io.StringIO())
+
+    assert list(Ingredient.objects.order_by("pk")) == [salt, pepper]
+    assert list(Tag.objects.all()) == [tag]
+    rows = RecipeIngredient.objects.values_list(
+        "recipes", "ingredients", "amount"
+    )
+    assert set(rows) == {
+        (both.pk, salt.pk, 15),
+        (both.pk, pepper.pk, 1),
+        (copy_only.pk, salt.pk, 3),
+    }
+    assert set(RecipeTag.objects.values_list("recipe", "tag")) == {
+        (both.pk, tag.pk),
+        (copy_only.pk, tag.pk),
+    }
+    assert list(
+        ShoppingListItem.objects.values_list("ingredient", "amount")
+    ) == [(salt.pk, 18)]
+
+
+def test_dedupe_relations(duplicates_allowed):
+    user, author = (
+        CustomUser.objects.create(username=name, email=f"{name}@a.ru")
+        for name in ("reader", "author")
+    )
+    recipe = Recipe.objects.create(
+        author=author, name="суп", text="суп", cooking_time=1, image="a.jpg"
+    )
+    follow = Follow.objects.create(user=user, author=author)
+    Follow.objects.create(user=user, author=author)
+    reverse = Follow.objects.create(user=author, author=user)
+    cart = ShopingCart.objects.create(user=user, recipe=recipe)
+    ShopingCart.objects.create(user=user, recipe=recipe)
+    tag = Tag.objects.create(name="Суп", color="#E26C2D", slug="soup")
+    recipe_tag = RecipeTag.objects.create(recipe=recipe, tag=tag)
+    RecipeTag.objects.create(recipe=recipe, tag=tag)
+
+    call_command("dedupe_reference_data", stdout=io.StringIO())
+
+    assert list(Follow.objects.order_by("pk")) == [follow, reverse]
+    assert list(ShopingCart.objects.all()) == [cart]
+    assert list(RecipeTag.objects.all()) == [recipe_tag]
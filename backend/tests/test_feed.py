@@ -0,0 +1,93 @@
+import pytest
+from rest_framework.test import APIClient
+
+from django.db.models import Count
+
+from foodgram.models import FeedEntry, Recipe
+from users.models import CustomUser
+
+from .test_query_budget import recipe_payload
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def author(new_user):
+    """The seeded author with the most recipes."""
+    return (
+        CustomUser.objects.exclude(pk=new_user.pk)
+        .annotate(recipes_total=Count("recipe"))
+        .order_by("-recipes_total", "pk")
+        .first()
+    )
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+def feed_ids(client):
+    response = client.get("/api/recipes/feed/", {"limit": 100})
+    assert response.status_code == 200
+    return [recipe["id"] for recipe in response.json()["results"]]
+
+
+def latest_ids(author):
+    return list(
+        Recipe.objects.filter(author=author)
+        .order_by("-pub_date", "-id")
+        .values_list("id", flat=True)
+    )
+
+
+def subscribe(client, author):
+    response = client.post(f"/api/users/{author.pk}/subscribe/")
+    assert response.status_code == 201
+
+
+def test_fan_out_on_create(new_user_client, author, author_client, image):
+    subscribe(new_user_client, author)
+    response = author_client.post(
+        "/api/recipes/", recipe_payload(image), format="json"
+    )
+    assert response.status_code == 201
+    assert feed_ids(new_user_client)[0] == response.json()["id"]
+    assert FeedEntry.objects.filter(recipe=response.json()["id"]).exists()
+
+
+def test_backfill_on_follow(new_user_client, author, settings):
+    settings.FEED_BACKFILL_LIMIT = 2
+    assert feed_ids(new_user_client) == []
+    subscribe(new_user_client, author)
+    assert feed_ids(new_user_client) == latest_ids(author)[:2]
+
+
+def test_unfollow_removes_entries(new_user, new_user_client, author):
+    subscribe(new_user_client, author)
+    assert feed_ids(new_user_client)
+    response = new_user_client.delete(f"/api/users/{author.pk}/subscribe/")
+    assert response.status_code == 204
+    assert feed_ids(new_user_client) == []
+    assert not FeedEntry.objects.filter(user=new_user).exists()
+
+
+def test_pull_merge(
+    new_user, new_user_client, author, author_client, image, settings
+):
+    subscribe(new_user_client, author)
+    backfilled = FeedEntry.objects.filter(user=new_user).count()
+    assert backfilled
+    # The author is too popular to fan out from now on.
+    settings.FEED_FANOUT_MAX_FOLLOWERS = 0
+    response = author_client.post(
+        "/api/recipes/", recipe_payload(image), format="json"
+    )
+    assert response.status_code == 201
+    assert FeedEntry.objects.filter(user=new_user).count() == backfilled
+    ids = feed_ids(new_user_client)
+    assert ids == latest_ids(author)
+    assert ids[0] == response.json()["id"]
+    assert len(ids) == len(set(ids))
@@ -0,0 +1,19 @@
+import pytest
+
+from foodgram.models import Favorite, Recipe, ShopingCart
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize(
+    "param, model",
+    [("is_favorited", Favorite), ("is_in_shopping_cart", ShopingCart)],
+)
+def test_personal_list_filters(user, user_client, param, model):
+    marked = model.objects.filter(user=user).count()
+    response = user_client.get(f"/api/recipes/?{param}=1")
+    assert response.data["count"] == marked
+    assert all(recipe[param] for recipe in response.data["results"])
+    for value in ("0", "false"):
+        response = user_client.get(f"/api/recipes/?{param}={value}")
+        assert response.data["count"] == Recipe.objects.count()
@@ -0,0 +1,73 @@
+import base64
+import io
+import struct
+import zlib
+
+import pytest
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.v1.serializers import Base64ImageField
+
+
+def png_chunk(kind, data):
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(kind + data))
+    )
+
+
+def png_header(width, height):
+    """Only the header of a PNG image, without any pixel data."""
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + png_chunk(b"IHDR", header)
+        + png_chunk(b"IDAT", b"")
+    )
+
+
+def data_url(content, ext="png"):
+    return f"data:image/{ext};base64,{base64.b64encode(content).decode()}"
+
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def decode(data):
+    return Base64ImageField().to_internal_value(data)
+
+
+def test_valid_image():
+    upload = decode(data_url(png(8, 8)))
+    assert upload.size == len(png(8, 8))
+    with Image.open(upload) as image:
+        assert image.size == (8, 8)
+
+
+def test_size_limit(settings):
+    settings.RECIPE_IMAGE_MAX_SIZE = 100
+    with pytest.raises(ValidationError, match="слишком большое"):
+        decode(data_url(b"\0" * 200))
+
+
+def test_pixel_limit(settings):
+    settings.RECIPE_IMAGE_MAX_PIXELS = 100
+    with pytest.raises(ValidationError, match="разрешение"):
+        decode(data_url(png(20, 20)))
+
+
+def test_decompression_bomb():
+    with pytest.raises(ValidationError, match="разрешение"):
+        decode(data_url(png_header(30000, 30000)))
+
+
+@pytest.mark.parametrize("encoded", ["not base64!", "abc"])
+def test_invalid_base64(encoded):
+    with pytest.raises(ValidationError):
+        decode(f"data:image/png;base64,{encoded}")
@@ -0,0 +1,112 @@
+import logging
+import time
+from datetime import timedelta
+
+import pytest
+
+from django.utils import timezone
+
+from jobs import worker
+from jobs.models import Job
+from jobs.registry import task
+
+pytestmark = pytest.mark.django_db
+calls = []
+
+
+@task(name="tests.record")
+def record(**kwargs):
+    calls.append(kwargs)
+
+
+@task(name="tests.fail", max_attempts=2)
+def fail():
+    raise RuntimeError("broken")
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+def test_claim():
+    due = Job.objects.create(name="tests.record")
+    Job.objects.create(
+        name="tests.record", run_after=timezone.now() + timedelta(hours=1)
+    )
+    running = Job.objects.create(name="tests.record", status=Job.RUNNING)
+    assert worker.claim(10) == [due.pk]
+    assert worker.claim(10) == []
+    due.refresh_from_db()
+    assert (due.status, due.attempts) == (Job.RUNNING, 1)
+    running.refresh_from_db()
+    assert running.status == Job.RUNNING
+
+
+def test_claim_reclaims_stale_jobs(settings):
+    stale = Job.objects.create(name="tests.record", status=Job.RUNNING)
+    Job.objects.filter(pk=stale.pk).update(
+        updated=timezone.now() - timedelta(seconds=settings.JOBS_TIMEOUT + 1)
+    )
+    assert worker.claim(10) == [stale.pk]
+
+
+def test_claim_limit():
+    for _ in range(3):
+        Job.objects.create(name="tests.record")
+    assert len(worker.claim(2)) == 2
+    assert len(worker.claim(2)) == 1
+
+
+def test_execute():
+    job = Job.objects.create(name="tests.record", payload={"pk": 1})
+    worker.claim(1)
+    assert worker.execute(job.pk) == Job.DONE
+    assert calls == [{"pk": 1}]
+
+
+def test_execute_retries_with_backoff(settings):
+    settings.JOBS_RETRY_DELAY = 10
+    job = Job.objects.create(name="tests.fail", max_attempts=2)
+    worker.claim(1)
+    started = timezone.now()
+    assert worker.execute(job.pk) == Job.PENDING
+    job.refresh_from_db()
+    assert "RuntimeError: broken" in job.last_error
+    assert job.run_after >= started + timedelta(seconds=20)
+    assert worker.claim(1) == []
+    Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+    worker.claim(1)
+    assert worker.execute(job.pk) == Job.FAILED
+    job.refresh_from_db()
+    assert job.attempts == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_heartbeat():
+    job = Job.objects.create(name="tests.record", status=Job.RUNNING)
+    Job.objects.filter(pk=job.pk).update(
+        updated=timezone.now() - timedelta(hours=1)
+    )
+    with worker.Heartbeat(job.pk, interval=0.01):
+        time.sleep(0.1)
+    job.refresh_from_db()
+    assert job.updated > timezone.now() - timedelta(minutes=1)
+
+
+def test_run_survives_crashed_jobs(monkeypatch, caplog):
+    claims = [[1, 2]]
+    monkeypatch.setattr(
+        worker, "claim", lambda limit: claims.pop() if claims else []
+    )
+
+    def execute(job_id):
+        raise RuntimeError("lost connection")
+
+    monkeypatch.setattr(worker, "execute", execute)
+    with caplog.at_level(logging.ERROR, logger=worker.__name__):
+        worker.Worker(concurrency=2, poll_interval=0.01).run(burst=True)
+    assert sorted(record.getMessage() for record in caplog.records) == [
+        "Worker of job #1 crashed",
+        "Worker of job #2 crashed",
+    ]
@@ -0,0 +1,44 @@
+import ipaddress
+
+import pytest
+
+from django.test import RequestFactory
+
+from foodgram_backend.metrics import is_internal
+
+
+def request_from(address):
+    request = RequestFactory().get("/metrics")
+    if address is None:
+        del request.META["REMOTE_ADDR"]
+    else:
+        request.META["REMOTE_ADDR"] = address
+    return request
+
+
+@pytest.mark.parametrize(
+    "address, internal",
+    [
+        ("127.0.0.1", True),
+        ("::1", True),
+        ("::ffff:127.0.0.1", True),
+        ("10.1.2.3", True),
+        ("192.168.0.1", False),
+        ("2001:db8::1", False),
+        ("", False),
+        ("unknown", False),
+        (None, False),
+    ],
+)
+def test_is_internal(settings, address, internal):
+    settings.METRICS_ALLOWED_NETWORKS = [
+        ipaddress.ip_network(network)
+        for network in ("10.0.0.0/8", "127.0.0.1/32", "::1/128")
+    ]
+    assert is_internal(request_from(address)) is internal
+
+
+@pytest.mark.django_db
+def test_metrics_view_rejects_unknown_address(client):
+    response = client.get("/metrics", REMOTE_ADDR="")
+    assert response.status_code == 403
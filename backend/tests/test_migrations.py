@@ -0,0 +1,13 @@
+import io
+
+import pytest
+
+from django.core.management import call_command
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("app", ["foodgram", "jobs", "users"])
+def test_no_missing_migrations(app):
+    call_command(
+        "makemigrations", app, check=True, dry_run=True, stdout=io.StringIO()
+    )
@@ -0,0 +1,29 @@
+import pytest
+
+from foodgram.models import Favorite, Follow, Recipe, ShopingCart
+from users.models import CustomUser
+
+pytestmark = pytest.mark.django_db
+
+
+def test_relation_managers(new_user):
+    user = new_user
+    author = CustomUser.objects.exclude(pk=user.pk).first()
+    recipe = Recipe.objects.first()
+    assert Follow.relations.add(user, author.pk)
+    assert not Follow.relations.add(user, author.pk)
+    assert Favorite.relations.add(user, recipe.pk)
+    assert ShopingCart.relations.add(user, recipe.pk)
+    assert list(user.follower.filter(author=author)) == list(
+        Follow.objects.filter(user=user, author=author)
+    )
+    assert author.following.filter(user=user).exists()
+    assert recipe.favorite_recipe.filter(user=user).exists()
+    assert user.shoper.filter(recipe=recipe).exists()
+    prefetched = CustomUser.objects.prefetch_related(
+        "follower", "shoper", "user"
+    ).get(pk=user.pk)
+    follows = prefetched.follower.all()
+    assert [follow.author_id for follow in follows] == [author.pk]
+    assert Follow.relations.remove(user, author.pk)
+    assert not Follow.relations.remove(user, author.pk)
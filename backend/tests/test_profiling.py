@@ -0,0 +1,32 @@
+import re
+
+import pytest
+from rest_framework.test import APIClient
+
+pytestmark = pytest.mark.django_db
+
+
+def server_timing(response):
+    return {
+        match["name"]: (float(match["duration"]), match["description"])
+        for match in re.finditer(
+            r'(?P<name>\w+);dur=(?P<duration>[\d.]+)(;desc="(?P<description>'
+            r'[^"]*)")?',
+            response["Server-Timing"],
+        )
+    }
+
+
+def test_server_timing(settings, dataset):
+    settings.PROFILING_ENABLED = True
+    response = APIClient().get("/api/recipes/")
+    metrics = server_timing(response)
+    assert set(metrics) == {"db", "view", "serialize", "render", "total"}
+    assert metrics["serialize"][1] == "RecipeSerializer"
+    assert metrics["serialize"][0] <= metrics["view"][0]
+    assert metrics["view"][0] <= metrics["total"][0]
+
+
+def test_profiling_disabled(dataset):
+    response = APIClient().get("/api/recipes/")
+    assert "Server-Timing" not in response
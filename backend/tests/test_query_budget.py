@@ -0,0 +1,308 @@
+"""Every endpoint runs a fixed number of queries, whatever the data size.
+
+The budgets are the measured counts, shared by the small and the large
+dataset, so a query per row (an N+1) fails at least the large variant.
+The empty variants use a user without follows, favorites or cart.
+"""
+import pytest
+
+from api.v1.pagination import SubscriptionsPagination
+from foodgram.models import (
+    Favorite, Follow, Ingredient, Recipe, ShopingCart, Tag,
+)
+from users.models import CustomUser
+
+pytestmark = pytest.mark.django_db
+
+
+def recipe_payload(image, ingredients=10):
+    return {
+        "ingredients": [
+            {"id": pk, "amount": 10}
+            for pk in Ingredient.objects.values_list("pk", flat=True)[
+                :ingredients
+            ]
+        ],
+        "tags": list(Tag.objects.values_list("pk", flat=True)[:2]),
+        "image": image,
+        "name": "Тестовый рецепт",
+        "text": "Описание",
+        "cooking_time": 10,
+    }
+
+
+def pick(budgets, client, anonymous_client):
+    """The budget for the anonymous or the authenticated client.
+
+    An authenticated client also reads the user's follows for
+    is_subscribed.
+    """
+    anonymous, authenticated = budgets
+    return anonymous if client is anonymous_client else authenticated
+
+
+@pytest.mark.parametrize(
+    "url, budgets",
+    [
+        ("/api/recipes/", (4, 5)),
+        ("/api/recipes/?tags=breakfast&tags=dinner", (5, 6)),
+        ("/api/recipes/?page=1&limit=20", (4, 5)),
+        ("/api/recipes/?pagination=cursor&limit=20", (3, 4)),
+        ("/api/users/", (2, 3)),
+        ("/api/tags/", (1, 1)),
+        ("/api/ingredients/", (1, 1)),
+        ("/api/ingredients/?name=инг", (1, 1)),
+    ],
+)
+def test_list(
+    any_client, anonymous_client, django_assert_max_num_queries, url, budgets
+):
+    budget = pick(budgets, any_client, anonymous_client)
+    with django_assert_max_num_queries(budget):
+        response = any_client.get(url)
+    assert response.status_code == 200
+
+
+def test_recipe_detail(
+    any_client, anonymous_client, django_assert_max_num_queries
+):
+    recipe = Recipe.objects.order_by("-favorites_count").first()
+    budget = pick((3, 4), any_client, anonymous_client)
+    with django_assert_max_num_queries(budget):
+        response = any_client.get(f"/api/recipes/{recipe.pk}/")
+    assert response.status_code == 200
+
+
+def test_reference_detail(any_client, django_assert_max_num_queries):
+    tag, ingredient = Tag.objects.first(), Ingredient.objects.first()
+    for url in (f"/api/tags/{tag.pk}/", f"/api/ingredients/{ingredient.pk}/"):
+        with django_assert_max_num_queries(1):
+            response = any_client.get(url)
+        assert response.status_code == 200
+
+
+def test_user_detail(
+    any_client, anonymous_client, django_assert_max_num_queries
+):
+    author = CustomUser.objects.order_by("-recipes_count").first()
+    budget = pick((1, 2), any_client, anonymous_client)
+    with django_assert_max_num_queries(budget):
+        response = any_client.get(f"/api/users/{author.pk}/")
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize(
+    "url",
+    ["/api/recipes/?is_favorited=1", "/api/recipes/?is_in_shopping_cart=1"],
+)
+def test_personal_lists(user_client, django_assert_max_num_queries, url):
+    with django_assert_max_num_queries(5):
+        response = user_client.get(url)
+    assert response.status_code == 200
+    assert response.data["results"]
+
+
+@pytest.mark.parametrize(
+    "url",
+    ["/api/recipes/?is_favorited=1", "/api/recipes/?is_in_shopping_cart=1"],
+)
+def test_empty_personal_lists(
+    new_user_client, django_assert_max_num_queries, url
+):
+    with django_assert_max_num_queries(1):
+        response = new_user_client.get(url)
+    assert response.status_code == 200
+    assert response.data["results"] == []
+
+
+def test_me(user_client, django_assert_max_num_queries):
+    with django_assert_max_num_queries(1):
+        response = user_client.get("/api/users/me/")
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize(
+    "url",
+    ["/api/users/subscriptions/", "/api/users/subscriptions/?recipes_limit=2"],
+)
+def test_subscriptions(
+    user, user_client, django_assert_max_num_queries, url
+):
+    Follow.objects.bulk_create(
+        Follow(user=user, author=author)
+        for author in CustomUser.objects.exclude(pk=user.pk).exclude(
+            following__user=user
+        )[:3]
+    )
+    with django_assert_max_num_queries(3):
+        response = user_client.get(url)
+    assert response.status_code == 200
+    assert response.data["results"]
+
+
+@pytest.mark.parametrize(
+    "url",
+    ["/api/users/subscriptions/", "/api/users/subscriptions/?recipes_limit=2"],
+)
+def test_subscriptions_without_follows(
+    new_user_client, django_assert_max_num_queries, url
+):
+    with django_assert_max_num_queries(1):
+        response = new_user_client.get(url)
+    assert response.status_code == 200
+    assert response.data["results"] == []
+
+
+def test_feed(user, user_client, django_assert_max_num_queries):
+    url = "/api/recipes/feed/?limit=5"
+    while url:
+        with django_assert_max_num_queries(6):
+            response = user_client.get(url)
+        assert response.status_code == 200
+        url = response.data["next"]
+
+
+def test_empty_feed(new_user_client, django_assert_max_num_queries):
+    with django_assert_max_num_queries(2):
+        response = new_user_client.get("/api/recipes/feed/")
+    assert response.status_code == 200
+    assert response.data["results"] == []
+
+
+@pytest.mark.parametrize("format", ["txt", "csv", "json"])
+def test_download_shopping_cart(
+    user_client, django_assert_max_num_queries, format
+):
+    with django_assert_max_num_queries(1):
+        response = user_client.get(
+            f"/api/recipes/download_shopping_cart/?format={format}"
+        )
+        b"".join(response.streaming_content)
+    assert response.status_code == 200
+
+
+def test_download_empty_shopping_cart(
+    new_user_client, django_assert_max_num_queries
+):
+    with django_assert_max_num_queries(1):
+        response = new_user_client.get(
+            "/api/recipes/download_shopping_cart/?format=json"
+        )
+        content = b"".join(response.streaming_content)
+    assert response.status_code == 200
+    assert content == b"[]"
+
+
+@pytest.mark.parametrize("ingredients", [1, 30])
+def test_recipe_create(
+    user_client, django_assert_max_num_queries, image, ingredients
+):
+    payload = recipe_payload(image, ingredients)
+    with django_assert_max_num_queries(19):
+        response = user_client.post("/api/recipes/", payload, format="json")
+    assert response.status_code == 201
+
+
+# SQLite splits bulk inserts into chunks of 999 parameters, so the cart
+# totals of more than ~300 user and ingredient pairs take extra queries.
+@pytest.mark.parametrize("ingredients, budget", [(1, 20), (10, 22)])
+def test_recipe_update(
+    user,
+    user_client,
+    django_assert_max_num_queries,
+    image,
+    ingredients,
+    budget,
+):
+    recipe = Recipe.objects.order_by("-in_carts_count").first()
+    Recipe.objects.filter(pk=recipe.pk).update(author=user)
+    payload = recipe_payload(image, ingredients)
+    del payload["image"]
+    with django_assert_max_num_queries(budget):
+        response = user_client.patch(
+            f"/api/recipes/{recipe.pk}/", payload, format="json"
+        )
+    assert response.status_code == 200
+
+
+def test_recipe_delete(user, user_client, django_assert_max_num_queries):
+    recipe = Recipe.objects.order_by("-in_carts_count").first()
+    Recipe.objects.filter(pk=recipe.pk).update(author=user)
+    with django_assert_max_num_queries(18):
+        response = user_client.delete(f"/api/recipes/{recipe.pk}/")
+    assert response.status_code == 204
+
+
+@pytest.mark.parametrize(
+    "action, model, budgets",
+    [("favorite", Favorite, (5, 4)), ("shopping_cart", ShopingCart, (11, 9))],
+)
+def test_recipe_toggles(
+    user, user_client, django_assert_max_num_queries, action, model, budgets
+):
+    """One INSERT or DELETE per toggle; counters and totals follow it.
+
+    The cart also updates the shopping list totals of the recipe's
+    ingredients, in a nested savepoint.
+    """
+    marked = model.objects.filter(user=user).values("recipe")
+    recipe = Recipe.objects.exclude(pk__in=marked).order_by("pk").first()
+    add_budget, remove_budget = budgets
+    url = f"/api/recipes/{recipe.pk}/{action}/"
+    rows = model.objects.filter(user=user, recipe=recipe)
+    with django_assert_max_num_queries(add_budget):
+        response = user_client.post(url)
+    assert response.status_code == 201
+    assert response.data["id"] == recipe.pk
+    with django_assert_max_num_queries(4):
+        response = user_client.post(url)
+    assert response.status_code == 400
+    assert rows.count() == 1
+    with django_assert_max_num_queries(remove_budget):
+        response = user_client.delete(url)
+    assert response.status_code == 204
+    assert not rows.exists()
+    with django_assert_max_num_queries(3):
+        response = user_client.delete(url)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("query, budget", [("", 7), ("?full=1", 9)])
+def test_subscribe(
+    user, user_client, django_assert_max_num_queries, query, budget
+):
+    author = (
+        CustomUser.objects.exclude(pk=user.pk)
+        .exclude(following__user=user)
+        .order_by("-recipes_count")
+        .first()
+    )
+    url = f"/api/users/{author.pk}/subscribe/"
+    with django_assert_max_num_queries(budget):
+        response = user_client.post(url + query)
+    assert response.status_code == 201
+    with django_assert_max_num_queries(5):
+        response = user_client.delete(url)
+    assert response.status_code == 204
+    assert not Follow.objects.filter(user=user, author=author).exists()
+
+
+def test_subscribe_full_links(user, user_client, monkeypatch):
+    monkeypatch.setattr(SubscriptionsPagination, "page_size", 1)
+    followed, author = CustomUser.objects.exclude(pk=user.pk).exclude(
+        following__user=user
+    )[:2]
+    Follow.relations.add(user, followed.pk)
+    response = user_client.post(
+        f"/api/users/{author.pk}/subscribe/?full=1&recipes_limit=1"
+    )
+    assert response.status_code == 201
+    next_link = response.data["next"]
+    assert next_link == (
+        "http://testserver/api/users/subscriptions/?page=2&recipes_limit=1"
+    )
+    response = user_client.get(next_link)
+    assert response.status_code == 200
+    assert response.data["previous"] == (
+        "http://testserver/api/users/subscriptions/?recipes_limit=1"
+    )
@@ -0,0 +1,124 @@
+"""The hot lookups are served by the expected indexes on PostgreSQL.
+
+The queries are the ones the endpoints actually run. They are captured
+from a request and explained with sequential scans disabled, so the
+planner falls back to one only when no index can answer the query.
+"""
+import re
+
+import pytest
+
+from django.contrib.admin.sites import site
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from foodgram.models import Follow, Ingredient
+from users.models import CustomUser
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        connection.vendor != "postgresql",
+        reason="EXPLAIN output is PostgreSQL specific",
+    ),
+]
+
+HOT_TABLES = (
+    "foodgram_favorite",
+    "foodgram_feedentry",
+    "foodgram_follow",
+    "foodgram_ingredient",
+    "foodgram_recipe",
+    "foodgram_recipetag",
+    "foodgram_shopingcart",
+    "foodgram_shoppinglistitem",
+)
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute(f"EXPLAIN {sql}")
+        return "\n".join(row[0] for row in cursor.fetchall())
+
+
+def request_plan(client, url):
+    """The plans of every SELECT the endpoint runs."""
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+        if response.streaming:
+            b"".join(response.streaming_content)
+    assert response.status_code == 200
+    return "\n".join(
+        explain(query["sql"])
+        for query in context.captured_queries
+        if query["sql"].lstrip().upper().startswith("SELECT")
+    )
+
+
+def assert_indexes(plan, *indexes):
+    """Assert the plan uses every index in ``indexes``, given as patterns.
+
+    A lookup by user alone may use either a composite index or the foreign
+    key index on user.
+    """
+    for table in HOT_TABLES:
+        assert not re.search(rf"Seq Scan on {table}\b", plan), plan
+    for index in indexes:
+        assert re.search(index, plan), plan
+
+
+@pytest.mark.parametrize(
+    "url, indexes",
+    [
+        (
+            "/api/recipes/",
+            (
+                "recipe_pub_date",
+                "unique_user_recipe",
+                "unique_cart_user_recipe",
+            ),
+        ),
+        (
+            "/api/recipes/?tags=breakfast&tags=dinner",
+            ("recipe_pub_date", "recipetag_tag_recipe"),
+        ),
+        ("/api/recipes/?is_favorited=1", ("unique_user_recipe",)),
+        ("/api/recipes/?is_in_shopping_cart=1", ("unique_cart_user_recipe",)),
+        ("/api/recipes/feed/", ("feed_user_pub_date",)),
+        (
+            "/api/recipes/download_shopping_cart/",
+            ("unique_user_ingredient|foodgram_shoppinglistitem_user_id",),
+        ),
+        # Any parameter besides the name skips the in-memory search index.
+        (
+            "/api/ingredients/?name=Ингр&format=json",
+            ("ingredient_name_pattern",),
+        ),
+    ],
+)
+def test_endpoint_plans(user_client, url, indexes):
+    assert_indexes(request_plan(user_client, url), *indexes)
+
+
+def test_subscriptions_plan(user, user_client):
+    for author in CustomUser.objects.exclude(pk=user.pk)[:3]:
+        Follow.relations.add(user, author.pk)
+    plan = request_plan(
+        user_client, "/api/users/subscriptions/?recipes_limit=2"
+    )
+    assert_indexes(
+        plan, "unique_follow|foodgram_follow_user_id", "recipe_author_pub_date"
+    )
+
+
+def test_admin_ingredient_search_plan(dataset):
+    admin = site._registry[Ingredient]
+    request = RequestFactory().get("/admin/foodgram/ingredient/")
+    queryset, _ = admin.get_search_results(
+        request, Ingredient.objects.all(), "гре"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+    assert_indexes(queryset.explain(), "ingredient_name_trgm")
@@ -0,0 +1,84 @@
+import io
+
+import pytest
+from rest_framework.test import APIClient
+
+from django.core.management import call_command
+
+from foodgram.models import Ingredient, Recipe, RecipeIngredient, RecipeTag
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipe(dataset):
+    """A recipe in some carts, with ingredients and tags."""
+    return (
+        Recipe.objects.filter(
+            recipes_ingredients__isnull=False, tags__isnull=False
+        )
+        .order_by("-in_carts_count", "pk")
+        .first()
+    )
+
+
+@pytest.fixture
+def author_client(recipe):
+    client = APIClient()
+    client.force_authenticate(recipe.author)
+    return client
+
+
+def stored_ingredients(recipe):
+    return dict(
+        RecipeIngredient.objects.filter(recipes=recipe).values_list(
+            "ingredients", "amount"
+        )
+    )
+
+
+def stored_tags(recipe):
+    return set(
+        RecipeTag.objects.filter(recipe=recipe).values_list("tag", flat=True)
+    )
+
+
+def assert_totals_consistent():
+    call_command("rebuild_shopping_list", check=True, stdout=io.StringIO())
+
+
+def test_patch_name_only(recipe, author_client):
+    ingredients, tags = stored_ingredients(recipe), stored_tags(recipe)
+    response = author_client.patch(
+        f"/api/recipes/{recipe.pk}/", {"name": "Новое название"}, format="json"
+    )
+    assert response.status_code == 200
+    recipe.refresh_from_db()
+    assert recipe.name == "Новое название"
+    assert stored_ingredients(recipe) == ingredients
+    assert stored_tags(recipe) == tags
+    assert_totals_consistent()
+
+
+def test_patch_ingredients(recipe, author_client):
+    current = stored_ingredients(recipe)
+    kept, *removed = current
+    added = Ingredient.objects.exclude(pk__in=current).first()
+    expected = {kept: current[kept] + 5, added.pk: 7}
+    response = author_client.patch(
+        f"/api/recipes/{recipe.pk}/",
+        {
+            "ingredients": [
+                {"id": pk, "amount": amount}
+                for pk, amount in expected.items()
+            ]
+        },
+        format="json",
+    )
+    assert response.status_code == 200
+    assert stored_ingredients(recipe) == expected
+    assert {
+        ingredient["id"]: ingredient["amount"]
+        for ingredient in response.json()["ingredients"]
+    } == expected
+    assert_totals_consistent()
@@ -0,0 +1,49 @@
+import pytest
+
+from foodgram.models import Ingredient
+
+pytestmark = pytest.mark.django_db
+
+NAMES = ("Сахар", "сахарная пудра", "Тростниковый сахар", "Соль", "Перец")
+
+
+@pytest.fixture
+def ingredients(db):
+    for name in NAMES:
+        Ingredient.objects.create(name=name, measurement_unit="г")
+
+
+def autocomplete(client, name):
+    response = client.get("/api/ingredients/", {"name": name})
+    assert response.status_code == 200
+    return [ingredient["name"] for ingredient in response.json()]
+
+
+def test_prefix_matches_first(client, ingredients):
+    assert autocomplete(client, "сахар") == [
+        "Сахар",
+        "сахарная пудра",
+        "Тростниковый сахар",
+    ]
+
+
+def test_case_insensitive(client, ingredients):
+    assert autocomplete(client, "СОЛ") == autocomplete(client, "сол") == [
+        "Соль"
+    ]
+
+
+def test_limit(client, ingredients, settings):
+    settings.INGREDIENT_SEARCH_LIMIT = 2
+    assert autocomplete(client, "сахар") == ["Сахар", "сахарная пудра"]
+    settings.INGREDIENT_SEARCH_LIMIT = 1
+    assert autocomplete(client, "ахар") == ["Сахар"]
+
+
+def test_reload_after_save(client, ingredients):
+    assert autocomplete(client, "перец") == ["Перец"]
+    Ingredient.objects.create(name="Перец чили", measurement_unit="г")
+    pepper = Ingredient.objects.get(name="Перец")
+    pepper.name = "Черный перец"
+    pepper.save()
+    assert autocomplete(client, "перец") == ["Перец чили", "Черный перец"]
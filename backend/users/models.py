@@ -19,6 +19,12 @@ class CustomUser(AbstractUser):
         "Пароль", max_length=150, blank=False, null=False
     )
     is_subscribed = models.BooleanField("Оформлена подписка", default="False")
+    recipes_count = models.PositiveIntegerField(
+        "Количество рецептов", default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        "Количество подписчиков", default=0, editable=False
+    )
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name", "password"]
 
@@ -0,0 +1,13 @@
+#!/bin/bash
+set -e
+
+
+# The backend container applies the migrations; wait for it instead of
+# racing its migrate and collectstatic.
+until python manage.py migrate --check > /dev/null 2>&1; do
+    echo "Waiting for the migrations to be applied"
+    sleep 5
+done
+
+
+exec "$@"